@@ -6,12 +6,33 @@ Simple JSON-based API server
 
 import json
 import os
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timezone
 from flask import Flask, jsonify, request, send_from_directory, Response
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 
+import bulk
+import codec
+import comments
+import inbox
+import replication
+import uploads
+from changelog import ChangeLog
+from finance import finance_index, payout_statistics, SOURCES as FINANCE_SOURCES, PERIODS
+from indexes import hackathon_index, parse_amount, parse_timestamp, parse_until, SORT_FIELDS, RANGE_FILTERS
+from querycache import query_cache
+from scheduler import StatusScheduler
+from sweeper import UploadSweeper, upload_references, read_state as upload_gc_state
+from storage import (
+    DATA_DIR, dataset_exists, read_raw, load_data, save_data, load_record, save_record,
+    load_shard, count_records, create_record, dataset_names, dataset_version, shard_id,
+    SNAPSHOT_DATASETS, SHARDED_DATASETS
+)
+
 app = Flask(__name__)
+app.json = codec.CodecJSONProvider(app)
 CORS(app, origins=["*"], supports_credentials=True)
 
 # Add global CORS headers for all responses
@@ -73,15 +94,32 @@ print(f"  KUBERNETES_SERVICE_HOST: {os.getenv('KUBERNETES_SERVICE_HOST')}")
 print(f"  DOCKER_CONTAINER: {os.getenv('DOCKER_CONTAINER')}")
 print(f"  BASE_URL will be determined dynamically from requests")
 
-# Data directory
-DATA_DIR = "data"
+# Uploads directory
+UPLOAD_DIR = uploads.UPLOAD_DIR
+
+# Hard cap on any request body (bulk imports are the largest); upload routes get a tighter limit below
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 256 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
+# Per-route request body limits, checked against Content-Length before the body is read
+ROUTE_BODY_LIMITS = {
+    'upload_file': uploads.UPLOAD_BODY_MAX_BYTES,
+    'create_hackathon': uploads.UPLOAD_BODY_MAX_BYTES,
+}
 
-# Uploads directory
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+def body_limit(endpoint):
+    """Largest request body an endpoint accepts"""
+    return ROUTE_BODY_LIMITS.get(endpoint, MAX_CONTENT_LENGTH)
+
+@app.before_request
+def enforce_body_limit():
+    limit = body_limit(request.endpoint)
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify({"error": f"Request body exceeds the {limit} byte limit"}), 413
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"Request body exceeds the {MAX_CONTENT_LENGTH} byte limit"}), 413
 
 # Allowed image extensions
 ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
@@ -92,25 +130,119 @@ def is_allowed_image(filename):
     ext = filename.rsplit(".", 1)[1].lower()
     return ext in ALLOWED_IMAGE_EXTENSIONS
 
-def load_data(filename):
-    """Load data from JSON file"""
-    filepath = os.path.join(DATA_DIR, f"{filename}.json")
-    if os.path.exists(filepath):
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    return []
-
-def save_data(filename, data):
-    """Save data to JSON file"""
-    filepath = os.path.join(DATA_DIR, f"{filename}.json")
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
-
-def get_next_id(data):
-    """Get next ID for new items"""
-    if not data:
-        return 1
-    return max(item.get('id', 0) for item in data) + 1
+# Pre-encoded response bodies per dataset, keyed by file signature (dataset version for
+# snapshot and sharded datasets)
+_encoded_cache = {}
+
+def encoded_data(filename):
+    """Return a dataset encoded as a response body, re-encoding only when it changes"""
+    if filename in SNAPSHOT_DATASETS or filename in SHARDED_DATASETS:
+        # Taken before loading: a write in between leaves a stale key, never a stale body
+        version = dataset_version(filename)
+        cached = _encoded_cache.get(filename)
+        if cached and cached[0] == version:
+            return cached[1]
+        body = app.json.encode(load_data(filename))
+        _encoded_cache[filename] = (version, body)
+        return body
+    signature, raw = read_raw(filename)
+    if raw is None:
+        return b"[]\n"
+    cached = _encoded_cache.get(filename)
+    if cached and cached[0] == signature:
+        return cached[1]
+    body = app.json.encode(codec.loads(raw))
+    _encoded_cache[filename] = (signature, body)
+    return body
+
+def dataset_response(filename):
+    """Serve a whole dataset using its cached encoded body"""
+    return Response(encoded_data(filename), mimetype=app.json.mimetype)
+
+# Change feed shared by all workers on this pod (see changelog.py)
+change_log = ChangeLog(os.path.join(DATA_DIR, 'changes.log'))
+
+# Datasets whose changes are pushed over /api/stream
+FEED_DATASETS = {"notifications", "messages", "comments"}
+
+# How often idle streams look for events from other workers, and send keep-alives
+FEED_POLL_INTERVAL = float(os.getenv('FEED_POLL_INTERVAL', 1.0))
+FEED_HEARTBEAT_INTERVAL = float(os.getenv('FEED_HEARTBEAT_INTERVAL', 15.0))
+
+def publish_change(dataset, op, record):
+    """Publish a created/updated record to the change feed"""
+    return change_log.append({
+        "dataset": dataset,
+        "op": op,
+        "record": record,
+        "timestamp": datetime.now().isoformat()
+    })
+
+def publish_changes(dataset, op, records):
+    """Publish many records to the change feed with a single append"""
+    timestamp = datetime.now().isoformat()
+    return change_log.append_many([
+        {"dataset": dataset, "op": op, "record": record, "timestamp": timestamp}
+        for record in records
+    ])
+
+def parse_feed_datasets(value):
+    """Datasets requested by a stream client (all feed datasets by default)"""
+    if not value:
+        return set(FEED_DATASETS)
+    return {name.strip() for name in value.split(',')} & FEED_DATASETS
+
+def feed_event_matches(event, datasets, recipient_id=None):
+    """Whether a stream client wants an event: its dataset, and with recipient_id only that
+    recipient's (and platform-wide) notifications and messages"""
+    if event.get('dataset') not in datasets:
+        return False
+    if recipient_id is None or event['dataset'] not in inbox.INBOX_DATASETS:
+        return True
+    target = (event.get('record') or {}).get('recipientId')
+    return target is None or str(target) == str(recipient_id)
+
+def feed_frames(cursor, datasets, recipient_id=None):
+    """Read events after the cursor and format matching ones as SSE frames"""
+    events, cursor = change_log.read_after(cursor)
+    frames = []
+    for event_id, event in events:
+        if feed_event_matches(event, datasets, recipient_id):
+            payload = codec.dumps(event).decode('utf-8')
+            frames.append(f"id: {event_id}\nevent: {event['dataset']}\ndata: {payload}\n\n")
+    return frames, cursor
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+# Cleared by gunicorn.conf.py in sync workers, where each open stream would hold a whole worker
+STREAMS_ENABLED = True
+
+# Leader/follower replication across pods (see replication.py)
+replication.init_app(app, change_log)
+bulk.init_app(app)
+
+# Hackathon status transitions; followers receive them from the leader instead
+status_scheduler = StatusScheduler(hackathon_index)
+SCHEDULER_ENABLED = replication.REPLICATION_ROLE != 'follower'
+
+# Deletes uploads no record references any more
+upload_sweeper = UploadSweeper(upload_references)
+
+@app.before_request
+def start_background_tasks():
+    # Background threads (these and the replica applier, see replication.py) are started on
+    # first request so each worker forked by gunicorn runs its own
+    if SCHEDULER_ENABLED:
+        status_scheduler.start()
+    upload_sweeper.start()
+
+def apply_due_statuses():
+    """Apply transitions that fell due since the scheduler thread last woke"""
+    if SCHEDULER_ENABLED:
+        status_scheduler.tick()
 
 # Initialize data files if they don't exist
 def init_sample_data():
@@ -123,11 +255,38 @@ def init_sample_data():
     ]
 
     for filename in required_files:
-        filepath = os.path.join(DATA_DIR, f"{filename}.json")
-        if not os.path.exists(filepath):
+        if not dataset_exists(filename):
             save_data(filename, [])
 
 
+# Set once every dataset is loaded; /ready answers 503 until then
+warmed_up = threading.Event()
+_warm_up_lock = threading.Lock()
+
+def warm_up():
+    """Create missing data files and load every dataset into this process's caches.
+
+    Under gunicorn this runs in the master before fork (see gunicorn.conf.py),
+    so workers start warm and share the loaded pages copy-on-write.
+    """
+    with _warm_up_lock:
+        if warmed_up.is_set():
+            return
+        started = time.time()
+        init_sample_data()
+        names = dataset_names()
+        for name in names:
+            load_data(name)
+            if name not in SNAPSHOT_DATASETS and name not in SHARDED_DATASETS:
+                encoded_data(name)
+        hackathon_index.refresh()
+        for source in FINANCE_SOURCES:
+            finance_index.refresh(source)
+        apply_due_statuses()
+        warmed_up.set()
+        print(f"Warm-up complete: {len(names)} datasets in {time.time() - started:.2f}s")
+
+
 # API Routes
 
 @app.route('/')
@@ -139,25 +298,74 @@ def health():
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/ready')
+def ready():
+    """Readiness probe: ready once datasets are warm (and a follower replica is current)"""
+    if not warmed_up.is_set():
+        # Without preload (e.g. the dev server) warm this worker in the background
+        threading.Thread(target=warm_up, daemon=True).start()
+        return jsonify({"status": "warming_up"}), 503
+
+    if replication.REPLICATION_ROLE == 'follower':
+        lag = replication.replica_lag()
+        if lag is None or lag > replication.REPLICATION_MAX_STALENESS:
+            return jsonify({"status": "replica_behind", "lag": lag}), 503
+
+    return jsonify({"status": "ready"})
+
 # Hackathons API
 @app.route('/api/hackathons', methods=['GET'])
+@query_cache.cached('hackathons')
 def get_hackathons():
-    hackathons = load_data('hackathons')
+    """List hackathons with filtering, sorting and pagination.
+
+    Filters: status, category, isOnline, tags (comma-separated, all must match),
+    startAfter/startBefore, endAfter/endBefore, deadlineAfter/deadlineBefore,
+    createdAfter/createdBefore (ISO dates, inclusive; a bare date as an upper
+    bound includes that whole day), minPrize/maxPrize.
+    Sorting: sort=startDate|endDate|registrationDeadline|totalPrizePool|createdAt;
+    prefix the field with '-' or pass order=desc for descending.
+    """
     status = request.args.get('status')
     category = request.args.get('category')
     is_online = request.args.get('isOnline')
     page = int(request.args.get('page', 1))
     limit = int(request.args.get('limit', 10))
 
-    # Filter hackathons
-    filtered_hackathons = hackathons
+    sort = request.args.get('sort')
+    descending = request.args.get('order', 'asc').lower() == 'desc'
+    if sort and sort.startswith('-'):
+        sort, descending = sort[1:], True
+    if sort and sort not in SORT_FIELDS:
+        return jsonify({"error": f"Unsupported sort field: {sort}"}), 400
+
+    # Range filters are answered from the sorted indexes
+    ranges = {}
+    for param, (field, bound) in RANGE_FILTERS.items():
+        value = request.args.get(param)
+        if value is None:
+            continue
+        if SORT_FIELDS[field](value) is None:
+            return jsonify({"error": f"Invalid value for {param}: {value}"}), 400
+        low, high = ranges.get(field, (None, None))
+        ranges[field] = (value, high) if bound == 'low' else (low, value)
+    tags = [t.strip() for t in request.args.get('tags', '').split(',') if t.strip()]
+
+    # Exact filters
+    is_online_bool = is_online.lower() == 'true' if is_online is not None else None
+    def matches(h):
+        if category and h['category'] != category:
+            return False
+        if is_online_bool is not None and h['isOnline'] != is_online_bool:
+            return False
+        return True
+
     if status:
-        filtered_hackathons = [h for h in filtered_hackathons if h['status'] == status]
-    if category:
-        filtered_hackathons = [h for h in filtered_hackathons if h['category'] == category]
-    if is_online is not None:
-        is_online_bool = is_online.lower() == 'true'
-        filtered_hackathons = [h for h in filtered_hackathons if h['isOnline'] == is_online_bool]
+        apply_due_statuses()
+    filtered_hackathons = hackathon_index.query(
+        sort=sort, descending=descending, ranges=ranges, tags=tags, status=status or None,
+        predicate=matches if (category or is_online is not None) else None
+    )
 
     # Pagination
     start = (page - 1) * limit
@@ -174,6 +382,18 @@ def get_hackathons():
         }
     })
 
+@app.route('/api/hackathons/stats', methods=['GET'])
+def get_hackathon_stats():
+    """Hackathon counts per status and the time of the next scheduled transition"""
+    apply_due_statuses()
+    counts = hackathon_index.status_counts()
+    next_due = status_scheduler.next_due()
+    return jsonify({
+        "total": sum(counts.values()),
+        "byStatus": counts,
+        "nextTransitionAt": datetime.fromtimestamp(next_due, timezone.utc).isoformat() if next_due else None
+    })
+
 @app.route('/api/hackathons', methods=['POST'])
 def create_hackathon():
     """Create a new hackathon. Supports multipart/form-data with optional image upload.
@@ -197,55 +417,45 @@ def create_hackathon():
     - image (file) [optional]
     """
 
-    # Support both JSON and multipart/form-data
+    # Support both JSON and multipart/form-data; a JSON base64 image is streamed to disk while parsing
     is_json = request.is_json and request.mimetype == 'application/json'
-    form = request.get_json() if is_json else request.form
+    pending_image = None
+    try:
+        if is_json:
+            form, pending_image = uploads.receive_json(request.stream)
+        else:
+            form = request.form
+            image_file = request.files.get('image')
+            if image_file and image_file.filename:
+                if not is_allowed_image(image_file.filename):
+                    return jsonify({"error": "Unsupported image type"}), 400
+                pending_image = uploads.receive_file(image_file)
+    except uploads.UploadError as e:
+        return jsonify({"error": e.message}), e.status
 
     title = (form.get('title') or '').strip()
     description = (form.get('description') or '').strip()
     if not title or not description:
+        if pending_image:
+            pending_image.discard()
         return jsonify({"error": "'title' and 'description' are required"}), 400
 
-    hackathons = load_data('hackathons')
-
-    # Handle image upload if present
+    # Move the received image into place, or use a direct URL/path from JSON
     image_path = None
-    if not is_json:
-        image_file = request.files.get('image')
-        if image_file and image_file.filename:
-            if not is_allowed_image(image_file.filename):
-                return jsonify({"error": "Unsupported image type"}), 400
-            safe_name = secure_filename(image_file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
-            filename = f"{timestamp}_{safe_name}"
-            image_file.save(os.path.join(UPLOAD_DIR, filename))
-            image_path = f"{get_base_url()}/uploads/{filename}"
-    else:
-        # JSON payload may include base64 image or direct URL/path
-        import base64
-        import re
-        image_b64 = form.get('imageBase64') or form.get('image_base64')
-        if image_b64:
-            # Support data URLs or raw base64
-            data_url_match = re.match(r'^data:image/(png|jpg|jpeg|gif|webp);base64,(.+)$', image_b64, re.IGNORECASE)
-            if data_url_match:
-                ext = data_url_match.group(1).lower()
-                b64_payload = data_url_match.group(2)
-            else:
-                # Default extension if not specified; use png
-                ext = 'png'
-                b64_payload = image_b64
-            try:
-                binary = base64.b64decode(b64_payload)
-            except Exception:
-                return jsonify({"error": "Invalid base64 image"}), 400
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
-            filename = f"{timestamp}_upload.{ext}"
-            with open(os.path.join(UPLOAD_DIR, filename), 'wb') as f:
-                f.write(binary)
-            image_path = f"{get_base_url()}/uploads/{filename}"
-        elif form.get('image'):
-            image_path = form.get('image')
+    if pending_image:
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        if is_json:
+            filename = f"{timestamp}_upload.{pending_image.ext}"
+        else:
+            filename = f"{timestamp}_{secure_filename(image_file.filename)}"
+        try:
+            pending_image.save(filename)
+        except uploads.UploadError as e:
+            pending_image.discard()
+            return jsonify({"error": e.message}), e.status
+        image_path = f"{get_base_url()}/uploads/{filename}"
+    elif is_json and form.get('image'):
+        image_path = form.get('image')
 
     def parse_bool(val, default=None):
         if val is None:
@@ -267,8 +477,7 @@ def create_hackathon():
             return val
         return [x.strip() for x in str(val).split(',') if x.strip()]
 
-    new_hackathon = {
-        "id": get_next_id(hackathons),
+    new_hackathon = create_record('hackathons', {
         "title": title,
         "description": description,
         "image": image_path,
@@ -307,10 +516,7 @@ def create_hackathon():
         "hackathonId": form.get('hackathonId'),
         "createdAt": datetime.now().isoformat(),
         "updatedAt": datetime.now().isoformat()
-    }
-
-    hackathons.append(new_hackathon)
-    save_data('hackathons', hackathons)
+    })
 
     response = jsonify(new_hackathon)
     response.status_code = 201
@@ -319,6 +525,7 @@ def create_hackathon():
     return response
 
 @app.route('/api/hackathons/<int:hackathon_id>', methods=['GET'])
+@query_cache.cached('hackathons', 'applications', 'sponsors')
 def get_hackathon(hackathon_id):
     hackathons = load_data('hackathons')
     hackathon = next((h for h in hackathons if h['id'] == hackathon_id), None)
@@ -327,12 +534,10 @@ def get_hackathon(hackathon_id):
         return jsonify({"error": "Hackathon not found"}), 404
 
     # Get applications for this hackathon
-    applications = load_data('applications')
-    hackathon_applications = [a for a in applications if a['hackathonId'] == hackathon_id]
+    hackathon_applications = load_shard('applications', hackathon_id)
 
     # Get sponsors for this hackathon
-    sponsors = load_data('sponsors')
-    hackathon_sponsors = [s for s in sponsors if s.get('hackathonId') == hackathon_id]
+    hackathon_sponsors = load_shard('sponsors', hackathon_id)
 
     hackathon['applicationsCount'] = len(hackathon_applications)
     hackathon['applications'] = hackathon_applications
@@ -343,6 +548,7 @@ def get_hackathon(hackathon_id):
 
 # Users API
 @app.route('/api/users', methods=['GET'])
+@query_cache.cached('users')
 def get_users():
     users = load_data('users')
     role = request.args.get('role')
@@ -388,6 +594,7 @@ def get_user(user_id):
     return jsonify(user)
 
 @app.route('/api/users/top/hackers', methods=['GET'])
+@query_cache.cached('users')
 def get_top_hackers():
     users = load_data('users')
     hackers = [u for u in users if u['role'] == 'hacker']
@@ -400,6 +607,7 @@ def get_top_hackers():
 
 # Organizations API
 @app.route('/api/organizations', methods=['GET'])
+@query_cache.cached('organizations')
 def get_organizations():
     organizations = load_data('organizations')
     page = int(request.args.get('page', 1))
@@ -446,7 +654,6 @@ def get_organization(org_id):
 def get_analytics_overview():
     users = load_data('users')
     hackathons = load_data('hackathons')
-    applications = load_data('applications')
     analytics = load_data('analytics')
 
     # Aggregate analytics by metric
@@ -460,27 +667,22 @@ def get_analytics_overview():
     return jsonify({
         "totalUsers": len(users),
         "totalHackathons": len(hackathons),
-        "totalApplications": len(applications),
+        "totalApplications": count_records('applications'),
         "metrics": metrics
     })
 
 @app.route('/api/analytics/track', methods=['POST'])
 def track_analytics():
     data = request.get_json()
-    analytics = load_data('analytics')
 
-    new_analytics = {
-        "id": get_next_id(analytics),
+    new_analytics = create_record('analytics', {
         "entityType": data.get('entityType'),
         "entityId": data.get('entityId'),
         "metric": data.get('metric'),
         "value": data.get('value', 1),
         "metadata": data.get('metadata', {}),
         "createdAt": datetime.now().isoformat()
-    }
-
-    analytics.append(new_analytics)
-    save_data('analytics', analytics)
+    })
 
     return jsonify(new_analytics), 201
 
@@ -489,116 +691,295 @@ def track_analytics():
 # Time slots API
 @app.route('/api/time-slots', methods=['GET'])
 def get_time_slots():
-    time_slots = load_data('timeSlots')
-    return jsonify(time_slots)
+    return dataset_response('timeSlots')
 
 # Countries API
 @app.route('/api/countries', methods=['GET'])
 def get_countries():
-    countries = load_data('countries')
-    return jsonify(countries)
+    return dataset_response('countries')
 
 # FAQs API
 @app.route('/api/faqs', methods=['GET'])
 def get_faqs():
-    faqs = load_data('faqs')
-    return jsonify(faqs)
+    return dataset_response('faqs')
 
 # Comments API
 @app.route('/api/comments', methods=['GET'])
 def get_comments():
-    comments = load_data('comments')
-    return jsonify(comments)
+    """All comments, or one discussion page with ?hackathonId= or ?projectId=
+
+    A discussion page lists top-level comments newest first; pass its
+    nextCursor back as ?before= for the next page (see also ?limit=).
+    """
+    if request.args.get('hackathonId') is None and request.args.get('projectId') is None:
+        return jsonify(comments.all_comments())
+
+    try:
+        scope = comments.scope_of({field: int(request.args[field]) for field in comments.SCOPE_FIELDS
+                                   if request.args.get(field) is not None})
+        shard_id(scope)  # negative ids name no discussion
+        before = int(request.args['before']) if request.args.get('before') else None
+        limit = parse_comments_limit()
+    except ValueError:
+        return jsonify({"error": "hackathonId, projectId, before and limit must be positive integers"}), 400
+    return jsonify(comments.discussion(scope, before, limit))
+
+@app.route('/api/comments/<int:comment_id>/replies', methods=['GET'])
+def get_comment_replies(comment_id):
+    """Direct replies to a comment, oldest first; pass nextCursor back as ?after="""
+    comment = load_record('comments', comment_id)
+    if not comment:
+        return jsonify({"error": "Comment not found"}), 404
+    try:
+        after = int(request.args['after']) if request.args.get('after') else None
+        limit = parse_comments_limit()
+    except ValueError:
+        return jsonify({"error": "after and limit must be positive integers"}), 400
+    return jsonify(comments.thread(comment, after, limit))
+
+def parse_comments_limit():
+    limit = int(request.args.get('limit', comments.COMMENTS_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError(limit)
+    return min(limit, comments.COMMENTS_MAX_PAGE_SIZE)
 
 @app.route('/api/comments', methods=['POST'])
 def create_comment():
+    """Create a comment on a hackathon (hackathonId) or project (projectId), or a reply (parentId)"""
     data = request.get_json()
-    comments = load_data('comments')
 
-    new_comment = {
-        "id": get_next_id(comments),
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    if not data.get('content'):
+        return jsonify({"error": "'content' is required"}), 400
+    for field in ('parentId', 'hackathonId', 'projectId'):
+        if data.get(field) is not None and (isinstance(data[field], bool) or not isinstance(data[field], int)):
+            return jsonify({"error": f"'{field}' must be an integer"}), 400
+
+    fields = {
         "author": data.get('author'),
+        "authorId": data.get('authorId'),
         "avatar": data.get('avatar'),
-        "content": data.get('content'),
-        "timestamp": datetime.now().isoformat(),
-        "likes": 0,
-        "replies": []
+        "content": data.get('content')
     }
-
-    comments.append(new_comment)
-    save_data('comments', comments)
+    parent = None
+    if data.get('parentId') is not None:
+        parent = load_record('comments', data['parentId'])
+        if not parent:
+            return jsonify({"error": "Parent comment not found"}), 404
+    elif data.get('projectId') is not None:
+        project = load_record('projects', data['projectId'])
+        if not project:
+            return jsonify({"error": "Project not found"}), 404
+        fields["projectId"] = project['id']
+        fields["hackathonId"] = project.get('hackathonId')
+    elif data.get('hackathonId') is not None:
+        if not load_record('hackathons', data['hackathonId']):
+            return jsonify({"error": "Hackathon not found"}), 404
+        fields["hackathonId"] = data['hackathonId']
+
+    new_comment = comments.create(fields, parent)
+    publish_change('comments', 'created', new_comment)
 
     return jsonify(new_comment), 201
 
+@app.route('/api/comments/<int:comment_id>/like', methods=['POST', 'DELETE'])
+def like_comment(comment_id):
+    """Like (POST) or unlike (DELETE) a comment; only its like counter is written"""
+    comment = load_record('comments', comment_id)
+    if not comment:
+        return jsonify({"error": "Comment not found"}), 404
+
+    count = comments.like(comment, 1 if request.method == 'POST' else -1)
+    publish_change('comments', 'updated', dict(comment, likes=count))
+
+    return jsonify({"id": comment_id, "likes": count})
+
 # Messages API
 @app.route('/api/messages', methods=['GET'])
 def get_messages():
-    messages = load_data('messages')
-    return jsonify(messages)
+    """All messages, or one recipient's inbox page with ?recipientId= (see get_inbox)"""
+    if request.args.get('recipientId'):
+        return get_inbox('messages', request.args['recipientId'])
+    return dataset_response('messages')
 
 @app.route('/api/messages', methods=['POST'])
 def create_message():
     data = request.get_json()
-    messages = load_data('messages')
 
-    new_message = {
-        "id": get_next_id(messages),
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    recipient_ids, error = parse_recipients(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    fields = {
         "sender": data.get('sender'),
+        "senderId": data.get('senderId'),
         "avatar": data.get('avatar'),
-        "content": data.get('content'),
-        "timestamp": datetime.now().isoformat(),
-        "unread": True
+        "content": data.get('content')
     }
+    new_messages = inbox.deliver('messages', fields, recipient_ids)
+    publish_changes('messages', 'created', new_messages)
 
-    messages.append(new_message)
-    save_data('messages', messages)
-
-    return jsonify(new_message), 201
+    if len(new_messages) == 1:
+        return jsonify(new_messages[0]), 201
+    return jsonify({"delivered": len(new_messages), "messages": new_messages}), 201
 
 # Notifications API
 @app.route('/api/notifications', methods=['GET'])
 def get_notifications():
-    notifications = load_data('notifications')
-    return jsonify(notifications)
+    """All notifications, or one recipient's inbox page with ?recipientId= (see get_inbox)"""
+    if request.args.get('recipientId'):
+        return get_inbox('notifications', request.args['recipientId'])
+    return dataset_response('notifications')
 
 @app.route('/api/notifications', methods=['POST'])
 def create_notification():
+    """Create a notification for recipientId, each of recipientIds, every participant of
+    hackathonId, or (with none of these) everyone"""
     data = request.get_json()
-    notifications = load_data('notifications')
 
-    new_notification = {
-        "id": get_next_id(notifications),
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    recipient_ids, error = parse_recipients(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    fields = {
         "type": data.get('type'),
         "title": data.get('title'),
-        "content": data.get('content'),
-        "timestamp": datetime.now().isoformat(),
-        "unread": True
+        "content": data.get('content')
     }
-
-    notifications.append(new_notification)
-    save_data('notifications', notifications)
-
-    return jsonify(new_notification), 201
+    if data.get('hackathonId') is not None:
+        fields["hackathonId"] = data['hackathonId']
+    new_notifications = inbox.deliver('notifications', fields, recipient_ids)
+    publish_changes('notifications', 'created', new_notifications)
+
+    if len(new_notifications) == 1:
+        return jsonify(new_notifications[0]), 201
+    return jsonify({"delivered": len(new_notifications), "notifications": new_notifications}), 201
+
+def parse_recipients(data):
+    """Recipient user ids of a new notification or message, and an error message if invalid"""
+    if data.get('recipientId') is not None:
+        recipient_ids = [data['recipientId']]
+    elif data.get('recipientIds') is not None:
+        recipient_ids = data['recipientIds']
+        if not isinstance(recipient_ids, list):
+            return None, "'recipientIds' must be a list"
+    elif data.get('hackathonId') is not None:
+        if isinstance(data['hackathonId'], bool) or not isinstance(data['hackathonId'], int) or data['hackathonId'] < 0:
+            return None, "'hackathonId' must be a non-negative integer"
+        recipient_ids = inbox.hackathon_participants(data['hackathonId'])
+        if not recipient_ids:
+            return None, "Hackathon has no participants"
+    else:
+        return [], None
+    if any(isinstance(r, bool) or not isinstance(r, int) or r < 0 for r in recipient_ids):
+        return None, "Recipient ids must be non-negative integers"
+    return list(dict.fromkeys(recipient_ids)), None
+
+# Per-user inboxes
+@app.route('/api/users/<int:user_id>/inbox', methods=['GET'])
+def get_inbox_counters(user_id):
+    """Unread and total counts of a user's notifications and messages (no inbox is read)"""
+    return jsonify({dataset: inbox.counters(dataset, user_id) for dataset in inbox.INBOX_DATASETS})
+
+@app.route('/api/users/<int:user_id>/<any(notifications, messages):dataset>', methods=['GET'])
+def get_user_inbox(user_id, dataset):
+    return get_inbox(dataset, user_id)
+
+def get_inbox(dataset, recipient_id):
+    """A page of an inbox, newest first.
+
+    Query parameters: before=<id> (the previous page's nextCursor), limit,
+    unread=true for unread items only.
+    """
+    try:
+        recipient_id = int(recipient_id)
+        before = int(request.args['before']) if request.args.get('before') else None
+        limit = int(request.args.get('limit', inbox.INBOX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "recipientId, before and limit must be integers"}), 400
+    if recipient_id < 0:
+        return jsonify({"error": "recipientId must be a non-negative integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be >= 1"}), 400
+    limit = min(limit, inbox.INBOX_MAX_PAGE_SIZE)
+    unread_only = request.args.get('unread', '').lower() == 'true'
+    return jsonify(inbox.page(dataset, recipient_id, before, limit, unread_only))
+
+@app.route('/api/users/<int:user_id>/<any(notifications, messages):dataset>/read', methods=['POST'])
+def mark_inbox_read(user_id, dataset):
+    """Mark items read: {"ids": [...]}, {"upTo": <id>} or {} for the whole inbox"""
+    data = request.get_json(silent=True) or {}
+    ids, up_to = data.get('ids'), data.get('upTo')
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+        return jsonify({"error": "'ids' must be a list of integers"}), 400
+    if up_to is not None and not isinstance(up_to, int):
+        return jsonify({"error": "'upTo' must be an integer"}), 400
+
+    updated = inbox.mark_read(dataset, user_id, ids, up_to)
+    publish_changes(dataset, 'updated', updated)
+    return jsonify({"updated": len(updated), **inbox.counters(dataset, user_id)})
+
+# Change feed (Server-Sent Events) for notifications, messages and comments
+@app.route('/api/stream', methods=['GET'])
+def stream_changes():
+    """Stream new and changed records as SSE.
+
+    Query parameters:
+    - datasets: comma-separated subset of notifications, messages, comments
+    - recipientId: only this user's (and platform-wide) notifications and messages
+    - lastEventId: resume point (the Last-Event-ID header takes precedence)
+    - since=0: replay the retained log instead of starting at the current end
+    """
+    if not STREAMS_ENABLED:
+        return jsonify({"error": "Streaming needs the ASGI worker (asgi:application with uvicorn.workers.UvicornWorker)"}), 503
+    datasets = parse_feed_datasets(request.args.get('datasets'))
+    recipient_id = request.args.get('recipientId') or None
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    if not last_event_id and request.args.get('since') != '0':
+        last_event_id = change_log.head()
+
+    def generate():
+        cursor = last_event_id
+        idle = 0.0
+        yield "retry: 3000\n\n"
+        while True:
+            frames, cursor = feed_frames(cursor, datasets, recipient_id)
+            for frame in frames:
+                yield frame
+            if frames:
+                idle = 0.0
+                continue
+            if not change_log.wait(cursor, FEED_POLL_INTERVAL):
+                idle += FEED_POLL_INTERVAL
+                if idle >= FEED_HEARTBEAT_INTERVAL:
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
 
 # Compatibility API
 @app.route('/api/compatibility', methods=['GET'])
 def get_compatibility():
-    compatibility = load_data('compatibility')
-    return jsonify(compatibility)
+    return dataset_response('compatibility')
 
 # Slider API
 @app.route('/api/slider', methods=['GET'])
 def get_slider():
-    slider_data = load_data('slider')
-    return jsonify(slider_data)
+    return dataset_response('slider')
 
 # Overview API - Returns active hackathons for overview page
 @app.route('/api/overview', methods=['GET'])
 def get_overview():
-    hackathons = load_data('hackathons')
-    # Filter for active hackathons
-    active_hackathons = [h for h in hackathons if h.get('status') == 'active']
-    return jsonify(active_hackathons)
+    # Answered from the index's active set
+    apply_due_statuses()
+    return jsonify(hackathon_index.with_status('active'))
 
 # Serve uploaded files
 @app.route('/uploads/<path:filename>', methods=['GET', 'OPTIONS'])
@@ -612,6 +993,10 @@ def serve_upload(filename):
         response.headers['Referrer-Policy'] = 'no-referrer'
         return response
     
+    if not os.path.exists(os.path.join(UPLOAD_DIR, secure_filename(filename))):
+        # Followers pull uploads they have not seen yet from the leader
+        replication.fetch_upload(secure_filename(filename), UPLOAD_DIR)
+
     response = send_from_directory(UPLOAD_DIR, filename)
     
     # Add CORS headers for image loading
@@ -635,45 +1020,50 @@ def upload_file():
                 return jsonify({"error": "No file provided"}), 400
             if not is_allowed_image(image_file.filename):
                 return jsonify({"error": "Unsupported image type"}), 400
-            safe_name = secure_filename(image_file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
-            filename = f"{timestamp}_{safe_name}"
-            image_file.save(os.path.join(UPLOAD_DIR, filename))
-            return jsonify({"url": f"{get_base_url()}/uploads/{filename}", "filename": filename}), 201
-
-        # JSON with base64
-        if request.is_json:
-            import base64, re
-            payload = request.get_json() or {}
-            image_b64 = payload.get('imageBase64') or payload.get('image_base64')
-            if not image_b64:
+            pending_image = uploads.receive_file(image_file)
+            filename = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{secure_filename(image_file.filename)}"
+
+        # JSON with base64, decoded to disk as it is read
+        elif request.is_json:
+            _, pending_image = uploads.receive_json(request.stream)
+            if pending_image is None:
                 return jsonify({"error": "imageBase64 required"}), 400
-            data_url_match = re.match(r'^data:image/(png|jpg|jpeg|gif|webp);base64,(.+)$', image_b64, re.IGNORECASE)
-            if data_url_match:
-                ext = data_url_match.group(1).lower()
-                b64_payload = data_url_match.group(2)
-            else:
-                ext = 'png'
-                b64_payload = image_b64
-            try:
-                binary = base64.b64decode(b64_payload)
-            except Exception:
-                return jsonify({"error": "Invalid base64 image"}), 400
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
-            filename = f"{timestamp}_upload.{ext}"
-            with open(os.path.join(UPLOAD_DIR, filename), 'wb') as f:
-                f.write(binary)
-            return jsonify({"url": f"{get_base_url()}/uploads/{filename}", "filename": filename}), 201
-
-        return jsonify({"error": "Unsupported upload format"}), 400
+            filename = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_upload.{pending_image.ext}"
+
+        else:
+            return jsonify({"error": "Unsupported upload format"}), 400
+
+        try:
+            pending_image.save(filename)
+        except Exception:
+            pending_image.discard()
+            raise
+        return jsonify({
+            "url": f"{get_base_url()}/uploads/{filename}",
+            "filename": filename,
+            "size": pending_image.size,
+            "sha256": pending_image.sha256
+        }), 201
+    except uploads.UploadError as e:
+        return jsonify({"error": e.message}), e.status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Query cache size, hit rate and evictions for the worker answering the request"""
+    return jsonify(dict(query_cache.stats(), pid=os.getpid()))
+
+@app.route('/api/uploads/gc', methods=['GET'])
+def get_upload_gc_stats():
+    """Orphaned upload sweeper progress and the space it has reclaimed"""
+    upload_references.refresh()
+    return jsonify(dict(upload_gc_state(), referencedFiles=len(upload_references)))
+
 # Charts API
 @app.route('/api/charts', methods=['GET'])
 def get_charts():
-    charts = load_data('charts')
-    return jsonify(charts)
+    return dataset_response('charts')
 
 @app.route('/api/charts/<chart_id>', methods=['GET'])
 def get_chart(chart_id):
@@ -686,8 +1076,7 @@ def get_chart(chart_id):
 # Judges API
 @app.route('/api/judges', methods=['GET'])
 def get_judges():
-    judges = load_data('judges')
-    return jsonify(judges)
+    return dataset_response('judges')
 
 @app.route('/api/judges/<int:judge_id>', methods=['GET'])
 def get_judge(judge_id):
@@ -701,47 +1090,115 @@ def get_judge(judge_id):
 # Product Activity API
 @app.route('/api/product-activity', methods=['GET'])
 def get_product_activity():
-    activity = load_data('productActivity')
-    return jsonify(activity)
+    return dataset_response('productActivity')
 
 # Pricing API
 @app.route('/api/pricing', methods=['GET'])
 def get_pricing():
-    pricing = load_data('pricing')
-    return jsonify(pricing)
+    return dataset_response('pricing')
 
 # Income API
 @app.route('/api/income', methods=['GET'])
 def get_income():
-    income = load_data('income')
-    return jsonify(income)
+    return dataset_response('income')
 
 # Payouts API
 @app.route('/api/payouts', methods=['GET'])
 def get_payouts():
-    payouts = load_data('payouts')
-    return jsonify(payouts)
+    return dataset_response('payouts')
+
+@app.route('/api/payouts', methods=['POST'])
+def record_payout():
+    """Record a payout; it is folded into the payout rollups and statistics as it is saved"""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    amount = parse_amount(data.get('amount'))
+    fees = parse_amount(data.get('fees')) if data.get('fees') is not None else 0.0
+    if amount is None or amount <= 0:
+        return jsonify({"error": "'amount' must be a positive number"}), 400
+    if fees is None or fees < 0:
+        return jsonify({"error": "'fees' must be a non-negative number"}), 400
+
+    payout = create_record('payouts', {
+        "date": data.get('date') or datetime.now().strftime('%Y-%m-%d'),
+        "status": data.get('status') or 'pending',
+        "method": data.get('method'),
+        "transactionId": data.get('transactionId'),
+        "hackathonId": data.get('hackathonId'),
+        "sponsorId": data.get('sponsorId'),
+        "amount": amount,
+        "fees": fees,
+        "net": round(amount - fees, 2),
+        "createdAt": datetime.now().isoformat()
+    })
+
+    response = jsonify(payout)
+    response.status_code = 201
+    return response
 
 # Payout Statistics API
 @app.route('/api/payout-statistics', methods=['GET'])
 def get_payout_statistics():
-    statistics = load_data('payoutStatistics')
-    return jsonify(statistics)
+    """Payout cards computed from the payout rollups (the data file supplies titles and icons)"""
+    return jsonify(payout_statistics(load_data('payoutStatistics')))
 
 # Statement Statistics API
 @app.route('/api/statement-statistics', methods=['GET'])
 def get_statement_statistics():
-    statistics = load_data('statementStatistics')
-    return jsonify(statistics)
+    return dataset_response('statementStatistics')
 
 # Transactions API
 @app.route('/api/transactions', methods=['GET'])
 def get_transactions():
-    transactions = load_data('transactions')
-    return jsonify(transactions)
+    return dataset_response('transactions')
+
+# Finance API
+@app.route('/api/finance/aggregate', methods=['GET'])
+def get_finance_aggregate():
+    """Sums, counts and percentiles over payouts, sponsors or transactions.
+
+    Parameters: source=payouts|sponsors|transactions (default payouts),
+    groupBy=status|hackathon|sponsor|method|type|day|week|month|year,
+    metric=amount|fees|net, from/to (ISO dates, inclusive), percentiles=50,90,99
+    """
+    source = request.args.get('source', 'payouts')
+    if source not in FINANCE_SOURCES:
+        return jsonify({"error": f"Unsupported source: {source}"}), 400
+    config = FINANCE_SOURCES[source]
+
+    group_by = request.args.get('groupBy') or None
+    if group_by and group_by not in config['dimensions'] and group_by not in PERIODS:
+        return jsonify({"error": f"Unsupported groupBy for {source}: {group_by}"}), 400
+    metric = request.args.get('metric', 'amount')
+    if metric not in config['metrics']:
+        return jsonify({"error": f"Unsupported metric for {source}: {metric}"}), 400
+
+    bounds = {}
+    for param, parse in (('from', parse_timestamp), ('to', parse_until)):
+        value = request.args.get(param)
+        if value is not None:
+            bounds[param] = parse(value)
+            if bounds[param] is None:
+                return jsonify({"error": f"Invalid value for {param}: {value}"}), 400
+
+    try:
+        percentiles = [float(p) for p in request.args.get('percentiles', '50,90,99').split(',') if p.strip()]
+    except ValueError:
+        return jsonify({"error": "percentiles must be numbers"}), 400
+    if any(p < 0 or p > 100 for p in percentiles):
+        return jsonify({"error": "percentiles must be between 0 and 100"}), 400
+
+    return jsonify(finance_index.aggregate(
+        source, group_by=group_by, metric=metric,
+        start=bounds.get('from'), end=bounds.get('to'), percentiles=percentiles
+    ))
 
 # Hackers API (alias for users)
 @app.route('/api/hackers', methods=['GET'])
+@query_cache.cached('users')
 def get_hackers():
     users = load_data('users')
     role = request.args.get('role')
@@ -773,14 +1230,15 @@ def get_hackers():
 
 # Sponsors API
 @app.route('/api/sponsors', methods=['GET'])
+@query_cache.cached('sponsors')
 def get_sponsors():
     """Get all sponsors, optionally filtered by hackathon ID"""
-    sponsors = load_data('sponsors')
     hackathon_id = request.args.get('hackathonId')
     
     if hackathon_id:
-        hackathon_id = int(hackathon_id)
-        sponsors = [s for s in sponsors if s.get('hackathonId') == hackathon_id]
+        sponsors = load_shard('sponsors', int(hackathon_id))
+    else:
+        sponsors = load_data('sponsors')
     
     return jsonify({
         "sponsors": sponsors,
@@ -800,10 +1258,7 @@ def create_sponsor():
         if field not in data:
             return jsonify({"error": f"Missing required field: {field}"}), 400
     
-    sponsors = load_data('sponsors')
-    
-    new_sponsor = {
-        "id": get_next_id(sponsors),
+    new_sponsor = create_record('sponsors', {
         "hackathonId": int(data['hackathonId']),
         "companyName": data['companyName'],
         "contributionAmount": data['contributionAmount'],
@@ -815,10 +1270,7 @@ def create_sponsor():
         "status": "approved",  # auto-approve for now
         "createdAt": datetime.now().isoformat(),
         "updatedAt": datetime.now().isoformat()
-    }
-    
-    sponsors.append(new_sponsor)
-    save_data('sponsors', sponsors)
+    })
     
     response = jsonify(new_sponsor)
     response.status_code = 201
@@ -827,8 +1279,7 @@ def create_sponsor():
 @app.route('/api/sponsors/<int:sponsor_id>', methods=['GET'])
 def get_sponsor(sponsor_id):
     """Get a specific sponsor by ID"""
-    sponsors = load_data('sponsors')
-    sponsor = next((s for s in sponsors if s['id'] == sponsor_id), None)
+    sponsor = load_record('sponsors', sponsor_id)
     
     if not sponsor:
         return jsonify({"error": "Sponsor not found"}), 404
@@ -843,8 +1294,7 @@ def update_sponsor(sponsor_id):
     if not data or 'status' not in data:
         return jsonify({"error": "Status is required"}), 400
     
-    sponsors = load_data('sponsors')
-    sponsor = next((s for s in sponsors if s['id'] == sponsor_id), None)
+    sponsor = load_record('sponsors', sponsor_id)
     
     if not sponsor:
         return jsonify({"error": "Sponsor not found"}), 404
@@ -852,24 +1302,24 @@ def update_sponsor(sponsor_id):
     sponsor['status'] = data['status']
     sponsor['updatedAt'] = datetime.now().isoformat()
     
-    save_data('sponsors', sponsors)
+    save_record('sponsors', sponsor)
     return jsonify(sponsor)
 
 # Projects/Submissions API
 @app.route('/api/projects', methods=['GET'])
+@query_cache.cached('projects')
 def get_projects():
     """Get all projects, optionally filtered by hackathon ID"""
-    projects = load_data('projects')
     hackathon_id = request.args.get('hackathonId')
     status = request.args.get('status')
     page = int(request.args.get('page', 1))
     limit = int(request.args.get('limit', 10))
     
-    # Filter projects
-    filtered_projects = projects
+    # Filter projects (a hackathon filter only reads that hackathon's shard)
     if hackathon_id:
-        hackathon_id = int(hackathon_id)
-        filtered_projects = [p for p in filtered_projects if p.get('hackathonId') == hackathon_id]
+        filtered_projects = load_shard('projects', int(hackathon_id))
+    else:
+        filtered_projects = load_data('projects')
     if status:
         filtered_projects = [p for p in filtered_projects if p.get('status') == status]
     
@@ -901,10 +1351,7 @@ def create_project():
         if field not in data:
             return jsonify({"error": f"Missing required field: {field}"}), 400
     
-    projects = load_data('projects')
-    
-    new_project = {
-        "id": get_next_id(projects),
+    new_project = create_record('projects', {
         "hackathonId": int(data['hackathonId']),
         "title": data['title'],
         "description": data['description'],
@@ -924,10 +1371,7 @@ def create_project():
         "prize": None,
         "createdAt": datetime.now().isoformat(),
         "updatedAt": datetime.now().isoformat()
-    }
-    
-    projects.append(new_project)
-    save_data('projects', projects)
+    })
     
     response = jsonify(new_project)
     response.status_code = 201
@@ -936,8 +1380,7 @@ def create_project():
 @app.route('/api/projects/<int:project_id>', methods=['GET'])
 def get_project(project_id):
     """Get a specific project by ID"""
-    projects = load_data('projects')
-    project = next((p for p in projects if p['id'] == project_id), None)
+    project = load_record('projects', project_id)
     
     if not project:
         return jsonify({"error": "Project not found"}), 404
@@ -952,8 +1395,7 @@ def update_project(project_id):
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
-    projects = load_data('projects')
-    project = next((p for p in projects if p['id'] == project_id), None)
+    project = load_record('projects', project_id)
     
     if not project:
         return jsonify({"error": "Project not found"}), 404
@@ -971,7 +1413,7 @@ def update_project(project_id):
     
     project['updatedAt'] = datetime.now().isoformat()
     
-    save_data('projects', projects)
+    save_record('projects', project)
     return jsonify(project)
 
 @app.route('/api/projects/<int:project_id>/judge', methods=['POST'])
@@ -982,8 +1424,7 @@ def judge_project(project_id):
     if not data or 'judgeId' not in data or 'scores' not in data:
         return jsonify({"error": "judgeId and scores are required"}), 400
     
-    projects = load_data('projects')
-    project = next((p for p in projects if p['id'] == project_id), None)
+    project = load_record('projects', project_id)
     
     if not project:
         return jsonify({"error": "Project not found"}), 404
@@ -1013,14 +1454,14 @@ def judge_project(project_id):
     
     project['updatedAt'] = datetime.now().isoformat()
     
-    save_data('projects', projects)
+    save_record('projects', project)
     return jsonify(project)
 
 @app.route('/api/hackathons/<int:hackathon_id>/projects', methods=['GET'])
+@query_cache.cached('projects')
 def get_hackathon_projects(hackathon_id):
     """Get all projects for a specific hackathon"""
-    projects = load_data('projects')
-    hackathon_projects = [p for p in projects if p.get('hackathonId') == hackathon_id]
+    hackathon_projects = load_shard('projects', hackathon_id)
     
     # Sort by total score (highest first) if scores exist
     hackathon_projects.sort(key=lambda x: x.get('totalScore', 0), reverse=True)
@@ -1033,8 +1474,8 @@ def get_hackathon_projects(hackathon_id):
 
 
 if __name__ == '__main__':
-    # Initialize sample data
-    init_sample_data()
+    # Initialize sample data and load every dataset
+    warm_up()
 
     print("Starting DeHack Python Backend...")
     print("Sample data initialized")
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+DeHack Platform - ASGI entry point
+Serves the same Flask routes from an event loop. Every Flask handler (and
+therefore every file read, write and upload) runs in a thread pool, so the
+loop itself never blocks and can hold many idle connections open.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 8080 --workers 4
+or:
+    gunicorn -k uvicorn.workers.UvicornWorker --workers 4 asgi:application
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.exceptions import HTTPException
+
+import codec
+from app import (
+    app as flask_app, warm_up, change_log, feed_frames, parse_feed_datasets, body_limit,
+    FEED_POLL_INTERVAL, FEED_HEARTBEAT_INTERVAL, SSE_HEADERS
+)
+
+# Threads available to blocking handlers in each worker process
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 64))
+
+# Request bodies larger than this are spooled to disk instead of memory
+ASGI_SPOOL_SIZE = int(os.getenv('ASGI_SPOOL_SIZE', 1024 * 1024))
+
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='dehack-asgi')
+
+
+def run_blocking(func, *args):
+    """Run a blocking callable in the handler thread pool"""
+    return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    path = scope.get('root_path', '') + scope['path']
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    return environ
+
+
+class BodyTooLarge(Exception):
+    """The request body is larger than its route accepts"""
+
+
+def route_body_limit(scope):
+    """Body limit of the route a request is for (unknown routes get the global limit; Flask answers them)"""
+    path = scope.get('root_path', '') + scope['path']
+    try:
+        endpoint, _ = flask_app.url_map.bind('localhost').match(path, method=scope['method'])
+    except HTTPException:
+        endpoint = None
+    return body_limit(endpoint)
+
+
+def declared_length(scope):
+    """Content-Length of a request, or None if it is missing or malformed"""
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length':
+            return int(value) if value.isdigit() else None
+    return None
+
+
+async def read_body(receive, limit):
+    """Collect the request body into a spooled temp file without blocking the loop
+
+    Raises BodyTooLarge as soon as more than `limit` bytes arrive (chunked
+    bodies have no Content-Length to check up front).
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=ASGI_SPOOL_SIZE)
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            body.close()
+            raise BodyTooLarge()
+        if chunk:
+            await run_blocking(body.write, chunk)
+        if not message.get('more_body', False):
+            break
+    await run_blocking(body.seek, 0)
+    return body
+
+
+async def send_too_large(send, limit):
+    await send({
+        'type': 'http.response.start',
+        'status': 413,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'access-control-allow-origin', b'*'),
+            (b'connection', b'close'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': codec.dumps({"error": f"Request body exceeds the {limit} byte limit"})})
+
+
+async def handle_http(scope, receive, send):
+    """Run a request through the Flask app in the thread pool and stream the result
+
+    Oversized bodies are refused before they are read: on Content-Length up
+    front, otherwise once the bytes received pass the route's limit.
+    """
+    limit = route_body_limit(scope)
+    length = declared_length(scope)
+    if length is not None and length > limit:
+        await send_too_large(send, limit)
+        return
+    try:
+        body = await read_body(receive, limit)
+    except BodyTooLarge:
+        await send_too_large(send, limit)
+        return
+    if body is None:
+        return
+
+    environ = build_environ(scope, body)
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [
+            (name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers
+        ]
+        return lambda data: None
+
+    def next_chunk(iterator):
+        try:
+            return next(iterator)
+        except StopIteration:
+            return None
+
+    result = await run_blocking(flask_app.wsgi_app, environ, start_response)
+    try:
+        iterator = iter(result)
+        first = await run_blocking(next_chunk, iterator)
+        await send({
+            'type': 'http.response.start',
+            'status': started['status'],
+            'headers': started['headers'],
+        })
+        chunk = first
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await run_blocking(next_chunk, iterator)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(result, 'close'):
+            await run_blocking(result.close)
+        await run_blocking(body.close)
+
+
+class FeedWatcher:
+    """One change-log poller per worker that wakes every open stream at once
+
+    Appends made by this worker wake streams immediately; appends from other
+    workers are picked up by polling the log head.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._changed = None
+        self._task = None
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._changed = asyncio.Event()
+            self._task = asyncio.create_task(self._poll())
+            change_log.add_listener(lambda *_: self._loop.call_soon_threadsafe(self._notify))
+
+    async def _poll(self):
+        head = await run_blocking(change_log.head)
+        while True:
+            await asyncio.sleep(FEED_POLL_INTERVAL)
+            current = await run_blocking(change_log.head)
+            if current != head:
+                head = current
+                self._notify()
+
+    async def wait(self, timeout, disconnected):
+        """Wait for a change; returns False on timeout"""
+        self.start()
+        changed = asyncio.ensure_future(self._changed.wait())
+        done, _ = await asyncio.wait({changed, disconnected}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        changed.cancel()
+        return bool(done)
+
+
+feed_watcher = FeedWatcher()
+
+
+async def wait_for_disconnect(receive):
+    """Drain request messages until the client goes away"""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def handle_stream(scope, receive, send):
+    """Serve /api/stream natively so idle SSE clients hold no handler thread"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+    datasets = parse_feed_datasets((query.get('datasets') or [None])[0])
+    recipient_id = (query.get('recipientId') or [None])[0] or None
+    cursor = headers.get('last-event-id') or (query.get('lastEventId') or [None])[0]
+    if not cursor and (query.get('since') or [None])[0] != '0':
+        cursor = await run_blocking(change_log.head)
+
+    response_headers = dict(SSE_HEADERS, **{
+        'Content-Type': 'text/event-stream; charset=utf-8',
+        'Access-Control-Allow-Origin': '*',
+    })
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response_headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': b"retry: 3000\n\n", 'more_body': True})
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        while not disconnected.done():
+            frames, cursor = await run_blocking(feed_frames, cursor, datasets, recipient_id)
+            if frames:
+                await send({'type': 'http.response.body', 'body': ''.join(frames).encode('utf-8'), 'more_body': True})
+                continue
+            if not await feed_watcher.wait(FEED_HEARTBEAT_INTERVAL, disconnected):
+                await send({'type': 'http.response.body', 'body': b": keep-alive\n\n", 'more_body': True})
+    finally:
+        disconnected.cancel()
+
+
+async def handle_lifespan(receive, send):
+    """Warm up datasets on startup and release the thread pool on shutdown"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await run_blocking(warm_up)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI application exposing every Flask route"""
+    if scope['type'] == 'http':
+        if scope['path'] == '/api/stream' and scope['method'] == 'GET':
+            await handle_stream(scope, receive, send)
+        else:
+            await handle_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
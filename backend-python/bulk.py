@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+DeHack Platform - Bulk import/export
+Moves whole datasets in and out as NDJSON (one JSON record per line), over
+HTTP or from the command line.
+
+Exports stream one record at a time: snapshot datasets are decoded record by
+record and sharded datasets one shard at a time, so memory stays flat however
+large the dataset. Records come out in id order (shard by shard, then id, for
+sharded datasets); the id of the last record received is the cursor to
+resume from with ?after=<id>.
+
+Imports read the body line by line, validate each record and commit them in
+batches of BULK_BATCH_SIZE, each batch being a single storage write. Records
+are upserted by id (records without an id get a new one), so re-sending a
+batch is harmless. The response reports the number of input lines
+committed; an interrupted or rejected import resumes by sending the same
+body again with ?cursor=<lines>.
+
+Command line:
+    python bulk.py export hackathons > hackathons.ndjson
+    python bulk.py export projects --after 120 -o projects.ndjson
+    python bulk.py import sponsors sponsors.ndjson --cursor 2000
+"""
+
+import argparse
+import os
+import sys
+
+from flask import jsonify, request, Response
+
+import codec
+import storage
+
+# Records validated and committed per storage write
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 1000))
+
+# Export responses are flushed in chunks of roughly this many bytes
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Fields a record must carry to be imported, per dataset
+REQUIRED_FIELDS = {
+    'hackathons': ('title',),
+    'projects': ('hackathonId', 'title'),
+    'applications': ('hackathonId',),
+    'users': ('username',),
+}
+
+
+class BulkImportError(ValueError):
+    """A record failed validation; nothing from its batch was committed"""
+
+    def __init__(self, line, message, summary):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+        self.summary = summary
+
+
+def _id_key(record_id):
+    # Most datasets use integer ids; a few (charts) use strings
+    if isinstance(record_id, int):
+        return (0, record_id, '')
+    return (1, 0, str(record_id))
+
+
+def parse_cursor(value):
+    """An export cursor is the last record id received"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _after(records, after):
+    records = sorted(records, key=lambda r: _id_key(r.get('id')))
+    if after is None:
+        return records
+    return [r for r in records if _id_key(r.get('id')) > _id_key(after)]
+
+
+def _shard_order(key):
+    return (not key.isdigit(), int(key) if key.isdigit() else 0, key)
+
+
+def iter_export(filename, after=None):
+    """Yield the records of a dataset in cursor order, starting after record id `after`"""
+    if filename in storage.SHARDED_DATASETS:
+        keys = sorted(storage.shard_keys(filename), key=_shard_order)
+        if after is not None:
+            start = storage.record_shard(filename, after)
+            if start is None:
+                raise KeyError(after)
+            keys = keys[keys.index(start):]
+        for i, key in enumerate(keys):
+            records = storage.load_shard(filename, key)
+            yield from _after(records, after if i == 0 else None)
+    elif filename in storage.SNAPSHOT_DATASETS:
+        if after is not None and not isinstance(after, int):
+            raise KeyError(after)
+        store = storage.snapshot_store(filename)
+        for record_id in sorted(store.ids()):
+            if after is None or record_id > after:
+                record = store.get(record_id)
+                if record is not None:
+                    yield record
+    else:
+        yield from _after(storage.load_data(filename), after)
+
+
+def export_chunks(filename, after=None):
+    """NDJSON bytes for a dataset export, in chunks of about EXPORT_CHUNK_SIZE"""
+    buffer, size = [], 0
+    for record in iter_export(filename, after):
+        line = codec.dumps(record) + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def validate(filename, record):
+    """Return an error message for an invalid record, or None"""
+    if not isinstance(record, dict):
+        return "record must be a JSON object"
+    if 'id' in record:
+        # Snapshot and shard indexes key records by integer id; plain JSON files also allow strings
+        allowed = (int,) if filename in storage.SNAPSHOT_DATASETS | storage.SHARDED_DATASETS else (int, str)
+        if isinstance(record['id'], bool) or not isinstance(record['id'], allowed):
+            return "id must be an integer"
+    if filename in storage.SHARDED_DATASETS and record.get(storage.shard_key(filename)) not in (None, ''):
+        # The shard key names the file the record is stored in
+        field = storage.shard_key(filename)
+        value = record[field]
+        if field == 'scope':
+            try:
+                storage.shard_id(value)
+            except ValueError:
+                return "scope must be hackathon-<id> or project-<id>"
+        elif isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            return f"{field} must be a non-negative integer"
+    missing = [field for field in REQUIRED_FIELDS.get(filename, ()) if record.get(field) in (None, '')]
+    if missing:
+        return f"missing required field(s): {', '.join(missing)}"
+    return None
+
+
+def import_lines(filename, lines, cursor=0, batch_size=BULK_BATCH_SIZE):
+    """Validate and upsert NDJSON lines in batches; returns a summary with the resume cursor
+
+    `lines` yields raw lines (bytes or str); the first `cursor` lines are skipped.
+    """
+    summary = {"dataset": filename, "imported": 0, "batches": 0, "cursor": cursor}
+    batch = []
+    highest = 0  # largest explicit integer id seen so far
+    consumed = 0
+
+    def commit():
+        # New ids come after the dataset's and every explicit id seen, allocated under the write lock
+        with storage.dataset_lock(filename):
+            next_id = max(storage.next_record_id(filename), highest + 1)
+            for record in batch:
+                if 'id' not in record:
+                    record['id'] = next_id
+                    next_id += 1
+            storage.save_records(filename, batch)
+        summary["imported"] += len(batch)
+        summary["batches"] += 1
+        summary["cursor"] = consumed
+        batch.clear()
+
+    for consumed, line in enumerate(lines, 1):
+        if consumed <= cursor:
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = codec.loads(line)
+        except ValueError as e:
+            raise BulkImportError(consumed, f"invalid JSON: {e}", summary)
+        error = validate(filename, record)
+        if error:
+            raise BulkImportError(consumed, error, summary)
+        if isinstance(record.get('id'), int):
+            highest = max(highest, record['id'])
+        batch.append(record)
+        if len(batch) >= batch_size:
+            commit()
+
+    if batch:
+        commit()
+    summary["cursor"] = max(summary["cursor"], consumed)
+    return summary
+
+
+# Flask wiring
+
+def init_app(app):
+    """Register the bulk import/export routes"""
+
+    def known(name):
+        return name in storage.dataset_names()
+
+    @app.route('/api/bulk/<dataset>/export', methods=['GET'])
+    def bulk_export(dataset):
+        """Stream a dataset as NDJSON; ?after=<id> resumes after that record"""
+        if not known(dataset):
+            return jsonify({"error": f"Unknown dataset: {dataset}"}), 404
+        after = parse_cursor(request.args.get('after'))
+        chunks = export_chunks(dataset, after)
+        try:
+            first = next(chunks, b'')
+        except KeyError:
+            return jsonify({"error": f"Unknown cursor: {after}"}), 400
+
+        def stream():
+            yield first
+            yield from chunks
+
+        response = Response(stream(), mimetype='application/x-ndjson')
+        response.headers['Content-Disposition'] = f'attachment; filename="{dataset}.ndjson"'
+        return response
+
+    @app.route('/api/bulk/<dataset>/import', methods=['POST'])
+    def bulk_import(dataset):
+        """Upsert NDJSON records from the request body; ?cursor=<lines> skips lines already committed"""
+        if not known(dataset):
+            return jsonify({"error": f"Unknown dataset: {dataset}"}), 404
+        try:
+            cursor = int(request.args.get('cursor', 0))
+            batch_size = int(request.args.get('batchSize', BULK_BATCH_SIZE))
+        except ValueError:
+            return jsonify({"error": "cursor and batchSize must be integers"}), 400
+        if cursor < 0 or batch_size < 1:
+            return jsonify({"error": "cursor must be >= 0 and batchSize >= 1"}), 400
+
+        try:
+            summary = import_lines(dataset, request.stream, cursor, batch_size)
+        except BulkImportError as e:
+            return jsonify(dict(e.summary, error=e.message, line=e.line)), 400
+        return jsonify(summary)
+
+
+# Command line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export DeHack datasets as NDJSON")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="write a dataset as NDJSON")
+    export.add_argument('dataset')
+    export.add_argument('--after', help="resume after this record id")
+    export.add_argument('-o', '--output', help="output file (default: stdout)")
+
+    load = commands.add_parser('import', help="upsert NDJSON records into a dataset")
+    load.add_argument('dataset')
+    load.add_argument('input', nargs='?', help="input file (default: stdin)")
+    load.add_argument('--cursor', type=int, default=0, help="skip this many lines already committed")
+    load.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        if args.dataset not in storage.dataset_names():
+            parser.error(f"unknown dataset: {args.dataset}")
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in export_chunks(args.dataset, parse_cursor(args.after)):
+                output.write(chunk)
+        except KeyError:
+            parser.error(f"unknown cursor: {args.after}")
+        finally:
+            if args.output:
+                output.close()
+        return 0
+
+    source = open(args.input, 'rb') if args.input else sys.stdin.buffer
+    try:
+        summary = import_lines(args.dataset, source, args.cursor, args.batch_size)
+    except BulkImportError as e:
+        print(f"Import stopped at {e}; resume with --cursor {e.summary['cursor']}", file=sys.stderr)
+        return 1
+    finally:
+        if args.input:
+            source.close()
+    print(f"Imported {summary['imported']} records into {args.dataset} "
+          f"in {summary['batches']} batches (cursor {summary['cursor']})", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+DeHack Platform - Change log
+Append-only NDJSON log shared by every worker process on a pod. Writers
+append under an flock, readers tail the file, so an event published by one
+worker is visible to streams served by all the others.
+
+The log is a series of numbered generations: changes.log is kept as
+changes.1.log, changes.2.log, ... Event ids are "<generation>:<offset>", the
+byte offset just past the event, so resuming from an id is a single seek.
+When the current file grows past its size limit the next generation is
+started and the one before the previous is deleted; a reader that resumes
+from the previous generation finishes that file first. Generation numbers
+are never reused, and an offset that is not on a line boundary is refused,
+so a stale or forged id can never make a reader seek into the middle of a
+line.
+"""
+
+import fcntl
+import os
+import threading
+
+import codec
+
+# Start a new generation once the current file grows past this many bytes
+CHANGELOG_MAX_BYTES = int(os.getenv('CHANGELOG_MAX_BYTES', 16 * 1024 * 1024))
+
+
+def parse_event_id(event_id):
+    """(generation, offset) from an event id, or None if it is malformed"""
+    try:
+        generation, offset = (int(part) for part in str(event_id).split(':', 1))
+    except ValueError:
+        return None
+    if generation < 0 or offset < 0:
+        return None
+    return generation, offset
+
+
+class ChangeLog:
+    """Cross-process append-only event log"""
+
+    def __init__(self, path, max_bytes=CHANGELOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._base, self._ext = os.path.splitext(path)
+        self._current = 0
+        self._appended = threading.Condition()
+        self._listeners = []
+
+    def _file(self, generation):
+        return f"{self._base}.{generation}{self._ext}"
+
+    def _generation(self):
+        """Current generation number, 0 before anything was logged"""
+        if self._current == 0:
+            prefix = f"{os.path.basename(self._base)}."
+            numbers = [0]
+            try:
+                entries = os.listdir(os.path.dirname(self.path) or '.')
+            except FileNotFoundError:
+                entries = []
+            for entry in entries:
+                number = entry[len(prefix):-len(self._ext)] if entry.endswith(self._ext) else ''
+                if entry.startswith(prefix) and number.isdigit():
+                    numbers.append(int(number))
+            self._current = max(numbers)
+        # Another worker may have started newer generations since
+        while os.path.exists(self._file(self._current + 1)):
+            self._current += 1
+        return self._current
+
+    def _rotate_if_needed(self):
+        """Start the next generation once the current file is too large (caller holds the lock)"""
+        generation = self._generation()
+        try:
+            size = os.path.getsize(self._file(generation)) if generation else None
+        except FileNotFoundError:
+            size = None
+        if size is not None and size < self.max_bytes:
+            return generation
+        generation += 1
+        if size is not None:
+            try:
+                os.remove(self._file(generation - 2))
+            except FileNotFoundError:
+                pass
+        open(self._file(generation), 'ab').close()
+        self._current = generation
+        return generation
+
+    def append(self, event):
+        """Append an event and return its id"""
+        return self.append_many([event])[0]
+
+    def append_many(self, events):
+        """Append events with a single locked write and return their ids"""
+        lines = [codec.dumps(event) + b"\n" for event in events]
+        with open(f"{self.path}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            generation = self._rotate_if_needed()
+            with open(self._file(generation), 'ab') as f:
+                start = f.seek(0, os.SEEK_END)
+                f.write(b''.join(lines))
+                f.flush()
+        event_ids = []
+        for line in lines:
+            start += len(line)
+            event_ids.append(f"{generation}:{start}")
+        with self._appended:
+            self._appended.notify_all()
+        for event_id, event in zip(event_ids, events):
+            for listener in self._listeners:
+                listener(event_id, event)
+        return event_ids
+
+    def add_listener(self, callback):
+        """Call `callback(event_id, event)` after every append made by this process"""
+        self._listeners.append(callback)
+
+    def head(self):
+        """Id of the current end of the log (start streaming from here for new events only)"""
+        generation = self._generation()
+        try:
+            return f"{generation}:{os.path.getsize(self._file(generation))}"
+        except FileNotFoundError:
+            return f"{generation}:0"
+
+    def _valid(self, generation, offset):
+        """Whether a generation's file is on disk and `offset` ends one of its lines"""
+        try:
+            with open(self._file(generation), 'rb') as f:
+                if offset > os.fstat(f.fileno()).st_size:
+                    return False
+                return offset == 0 or os.pread(f.fileno(), 1, offset - 1) == b"\n"
+        except FileNotFoundError:
+            return False
+
+    def retains(self, event_id):
+        """Whether events after `event_id` are still on disk (current or previous generation)"""
+        parsed = parse_event_id(event_id)
+        if parsed is None:
+            return False
+        generation, offset = parsed
+        current = self._generation()
+        if generation == 0 and offset == 0:
+            # Taken before anything was logged: everything since starts at generation 1
+            if current == 0:
+                return True
+            generation = 1
+        return generation in (current, current - 1) and self._valid(generation, offset)
+
+    def _read_file(self, generation, offset, limit):
+        events = []
+        try:
+            with open(self._file(generation), 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # a writer is still appending this line
+                    offset += len(line)
+                    events.append((f"{generation}:{offset}", codec.loads(line)))
+                    if len(events) >= limit:
+                        break
+        except FileNotFoundError:
+            pass
+        return events, offset
+
+    def read_after(self, event_id=None, limit=500):
+        """Return up to `limit` (id, event) pairs published after `event_id`, plus the new cursor
+
+        An unknown, expired or malformed id replays the current generation from the start.
+        """
+        current = self._generation()
+        if current == 0:
+            return [], event_id or '0:0'
+
+        generation, offset = current, 0
+        if event_id and self.retains(event_id):
+            generation, offset = parse_event_id(event_id)
+            generation = max(generation, 1)  # '0:0' (before anything was logged) starts at generation 1
+
+        events = []
+        if generation < current:
+            events, _ = self._read_file(generation, offset, limit)
+            if len(events) >= limit:
+                return events, events[-1][0]
+            offset = 0
+        more, offset = self._read_file(current, offset, limit - len(events))
+        return events + more, f"{current}:{offset}"
+
+    def wait(self, event_id, timeout):
+        """Block until something is appended after `event_id` or the timeout passes
+
+        Appends from this process wake waiters immediately; appends from other
+        workers are noticed on the next check.
+        """
+        with self._appended:
+            if self.head() != event_id:
+                return True
+            self._appended.wait(timeout)
+        return self.head() != event_id
@@ -0,0 +1,65 @@
+"""
+DeHack Platform - JSON codec
+Single place that turns records into bytes and back, for both the data
+files and HTTP responses. Uses orjson when it is installed and falls back
+to the standard library otherwise.
+"""
+
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# JSON_CODEC=stdlib forces the fallback even when orjson is installed
+if os.getenv('JSON_CODEC', 'auto').lower() == 'stdlib':
+    orjson = None
+
+CODEC_NAME = 'orjson' if orjson else 'stdlib'
+
+
+def dumps(obj, pretty=False, sort_keys=False, default=None):
+    """Encode an object to UTF-8 JSON bytes (compact unless pretty is set)"""
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+
+    if pretty:
+        text = json.dumps(obj, indent=2, sort_keys=sort_keys, default=default, ensure_ascii=False)
+    else:
+        text = json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys, default=default, ensure_ascii=False)
+    return text.encode('utf-8')
+
+
+def loads(data):
+    """Decode JSON from bytes or str"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by the codec so jsonify skips the stdlib encoder"""
+
+    def encode(self, obj):
+        """Encode a response body the same way jsonify would"""
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        return dumps(obj, pretty=pretty, sort_keys=self.sort_keys, default=self.default) + b"\n"
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=self.sort_keys, default=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj), mimetype=self.mimetype)
@@ -0,0 +1,122 @@
+"""
+DeHack Platform - Threaded comments
+Comments belong to a discussion scope, a hackathon ("hackathon-<id>") or a
+project ("project-<id>"), and the comments dataset is sharded by scope (see
+storage.py), so a discussion page reads and appends to its own file only.
+Replies are plain records with a parentId; a thread is the replies to one
+comment, paged with a cursor like any list. Reply counts are counted from
+the scope's records when a page is read, so adding a reply writes just the
+new record.
+
+Likes are kept out of the comment records: each comment has an 8-byte slot
+in data/comment-likes.counters (slot = comment id, see storage.CounterFile),
+updated in place with pread/pwrite under a byte-range lock on that slot.
+Liking never rewrites a comments file, and likes on different comments do
+not wait for each other. Each update is still a storage write (a
+'set_counter' of the new value), so replication carries likes to followers.
+A comment's like count is its stored `likes` (comments created before this
+file existed) plus its slot.
+"""
+
+import os
+from datetime import datetime
+
+import storage
+
+# Items per page, default and maximum
+COMMENTS_PAGE_SIZE = int(os.getenv('COMMENTS_PAGE_SIZE', 20))
+COMMENTS_MAX_PAGE_SIZE = int(os.getenv('COMMENTS_MAX_PAGE_SIZE', 100))
+
+# Request field naming the scope -> scope prefix (a project's discussion is its own scope)
+SCOPE_FIELDS = {'projectId': 'project', 'hackathonId': 'hackathon'}
+
+likes = storage.counter('comment-likes')
+
+
+def scope_of(fields):
+    """Scope name from hackathonId/projectId in a request or record, or None"""
+    for field, prefix in SCOPE_FIELDS.items():
+        if fields.get(field) is not None:
+            return f"{prefix}-{fields[field]}"
+    return None
+
+
+def like_count(record):
+    return record.get('likes', 0) + likes.get(record['id'])
+
+
+def present(record, reply_counts=None):
+    """A comment as served: current like count and number of direct replies"""
+    return dict(record, likes=like_count(record), replyCount=(reply_counts or {}).get(record['id'], 0))
+
+
+def _page(records, reply_counts, cursor, limit, newest_first):
+    """One page of a list sorted by id, continuing from the cursor id"""
+    total = len(records)
+    if newest_first:
+        records = [r for r in reversed(records) if cursor is None or r['id'] < cursor]
+    else:
+        records = [r for r in records if cursor is None or r['id'] > cursor]
+    items = records[:limit]
+    return {
+        "items": [present(r, reply_counts) for r in items],
+        "nextCursor": items[-1]['id'] if len(records) > limit else None,
+        "total": total,
+    }
+
+
+def _reply_counts(records):
+    reply_counts = {}
+    for record in records:
+        if record.get('parentId') is not None:
+            reply_counts[record['parentId']] = reply_counts.get(record['parentId'], 0) + 1
+    return reply_counts
+
+
+def _scope_records(scope):
+    records = storage.load_shard('comments', scope)
+    records.sort(key=lambda r: r['id'])
+    return records, _reply_counts(records)
+
+
+def all_comments():
+    """Every comment as served, with like and reply counts"""
+    records = storage.load_data('comments')
+    reply_counts = _reply_counts(records)
+    return [present(r, reply_counts) for r in records]
+
+
+def discussion(scope, before=None, limit=COMMENTS_PAGE_SIZE):
+    """Top-level comments of a scope, newest first, below the id `before`"""
+    records, reply_counts = _scope_records(scope)
+    top = [r for r in records if r.get('parentId') is None]
+    return _page(top, reply_counts, before, limit, newest_first=True)
+
+
+def thread(comment, after=None, limit=COMMENTS_PAGE_SIZE):
+    """Direct replies to a comment, oldest first, after the id `after`"""
+    records, reply_counts = _scope_records(comment.get('scope'))
+    replies = [r for r in records if r.get('parentId') == comment['id']]
+    return _page(replies, reply_counts, after, limit, newest_first=False)
+
+
+def create(fields, parent=None):
+    """Store a new comment (a reply when parent is given) and return it"""
+    comment = dict(fields)
+    if parent is not None:
+        comment['scope'] = parent.get('scope')
+        for field in SCOPE_FIELDS:
+            if parent.get(field) is not None:
+                comment[field] = parent[field]
+        comment['parentId'] = parent['id']
+    else:
+        comment['scope'] = scope_of(fields)
+        comment['parentId'] = None
+    comment['timestamp'] = datetime.now().isoformat()
+    return present(storage.create_record('comments', comment))
+
+
+def like(comment, delta):
+    """Add or remove one like; the count never drops below zero. Returns the new count"""
+    base = comment.get('likes', 0)
+    return base + likes.add(comment['id'], delta, floor=-base)
@@ -0,0 +1,257 @@
+"""
+DeHack Platform - Financial rollups
+Aggregates payouts, sponsor contributions and transactions server-side, so
+clients get totals, counts and percentiles instead of downloading the raw
+files and summing them.
+
+Each record of a source becomes a fact: its time, its dimension values
+(status, hackathon, sponsor, ...) and its amounts. Rollups keep, per
+dimension and group, the count, the sum of every metric and the metric
+values in sorted order (for percentiles). They are updated in place as
+records are written through the storage write listener - a sponsor being
+created or a payout being recorded adds one fact - and a source is re-read
+only when another worker's write changes its dataset version.
+"""
+
+import bisect
+from datetime import datetime, timezone
+
+import storage
+from indexes import parse_amount, parse_timestamp
+
+# Period granularities and how an epoch timestamp maps to a bucket key
+PERIODS = {
+    'day': lambda t: t.strftime('%Y-%m-%d'),
+    'week': lambda t: '%04d-W%02d' % t.isocalendar()[:2],
+    'month': lambda t: t.strftime('%Y-%m'),
+    'year': lambda t: t.strftime('%Y'),
+}
+
+
+def _hackathon(record):
+    nested = record.get('hackathon')
+    if isinstance(nested, dict):
+        return nested.get('id')
+    return record.get('hackathonId')
+
+
+# Aggregated sources: time field, metrics (name -> field) and dimensions (name -> value getter)
+SOURCES = {
+    'payouts': {
+        'time': 'date',
+        'metrics': {'amount': 'amount', 'fees': 'fees', 'net': 'net'},
+        'dimensions': {
+            'status': lambda r: r.get('status'),
+            'method': lambda r: r.get('method'),
+            'hackathon': _hackathon,
+            'sponsor': lambda r: r.get('sponsorId'),
+        },
+    },
+    'sponsors': {
+        'time': 'createdAt',
+        'metrics': {'amount': 'contributionAmount'},
+        'dimensions': {
+            'status': lambda r: r.get('status'),
+            'hackathon': _hackathon,
+            'sponsor': lambda r: r.get('companyName'),
+        },
+    },
+    'transactions': {
+        'time': 'timestamp',
+        'metrics': {'amount': 'amount'},
+        'dimensions': {
+            'status': lambda r: r.get('status'),
+            'type': lambda r: r.get('type'),
+            'hackathon': _hackathon,
+            'sponsor': lambda r: r.get('sponsorId'),
+        },
+    },
+}
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+def period_key(timestamp, period):
+    if timestamp is None:
+        return None
+    return PERIODS[period](datetime.fromtimestamp(timestamp, timezone.utc))
+
+
+def percentile(values, p):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not values:
+        return None
+    position = (len(values) - 1) * p / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+class Group:
+    """Count, sums and sorted values of the facts in one group"""
+
+    def __init__(self, metrics):
+        self.count = 0
+        self.sums = {metric: 0.0 for metric in metrics}
+        self.values = {metric: [] for metric in metrics}
+
+    def add(self, amounts):
+        self.count += 1
+        for metric, value in amounts.items():
+            if value is not None:
+                self.sums[metric] += value
+                bisect.insort(self.values[metric], value)
+
+    def remove(self, amounts):
+        self.count -= 1
+        for metric, value in amounts.items():
+            if value is not None:
+                self.sums[metric] -= value
+                values = self.values[metric]
+                i = bisect.bisect_left(values, value)
+                if i < len(values) and values[i] == value:
+                    del values[i]
+
+    def summary(self, metric, percentiles):
+        values = self.values[metric]
+        return {
+            "count": self.count,
+            "sum": round(self.sums[metric], 2) if values else 0,
+            "avg": round(self.sums[metric] / len(values), 2) if values else None,
+            "min": values[0] if values else None,
+            "max": values[-1] if values else None,
+            "percentiles": {f"p{p:g}": percentile(values, p) for p in percentiles},
+        }
+
+
+class Rollups:
+    """Incrementally maintained groupings of one source"""
+
+    def __init__(self, source):
+        self.config = SOURCES[source]
+        self.dimensions = list(self.config['dimensions']) + list(PERIODS)
+        self.facts = {}
+        self.total = Group(self.config['metrics'])
+        self.groups = {dimension: {} for dimension in self.dimensions}
+
+    def fact(self, record):
+        config = self.config
+        timestamp = parse_timestamp(record.get(config['time']))
+        keys = {name: get(record) for name, get in config['dimensions'].items()}
+        for period in PERIODS:
+            keys[period] = period_key(timestamp, period)
+        amounts = {metric: parse_amount(record.get(field)) for metric, field in config['metrics'].items()}
+        return timestamp, keys, amounts
+
+    def _apply(self, fact, sign):
+        _, keys, amounts = fact
+        (self.total.add if sign > 0 else self.total.remove)(amounts)
+        for dimension in self.dimensions:
+            key = keys[dimension]
+            if key is None and dimension in PERIODS:
+                continue
+            groups = self.groups[dimension]
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = Group(self.config['metrics'])
+            if sign > 0:
+                group.add(amounts)
+            else:
+                group.remove(amounts)
+                if not group.count:
+                    del groups[key]
+
+    def upsert(self, record):
+        record_id = record.get('id')
+        previous = self.facts.pop(record_id, None)
+        if previous is not None:
+            self._apply(previous, -1)
+        fact = self.fact(record)
+        self.facts[record_id] = fact
+        self._apply(fact, 1)
+
+
+class FinanceIndex(storage.DatasetIndex):
+    """Rollups for every source, kept in sync with the datasets"""
+
+    def __init__(self):
+        super().__init__(SOURCES)
+        self.rollups = {}
+
+    def _rebuild(self, source, records):
+        rollups = Rollups(source)
+        for record in records:
+            rollups.upsert(record)
+        self.rollups[source] = rollups
+
+    def _upsert(self, source, record):
+        self.rollups[source].upsert(record)
+
+    def aggregate(self, source, group_by=None, metric='amount', start=None, end=None,
+                  percentiles=DEFAULT_PERCENTILES):
+        """Totals and per-group summaries of a source
+
+        Without a time range the answer is read straight from the rollups; with
+        one, the source's facts are filtered and grouped on the fly.
+        """
+        self.refresh(source)
+        with self.lock:
+            rollups = self.rollups[source]
+            if start is None and end is None:
+                total = rollups.total
+                groups = rollups.groups[group_by] if group_by else {}
+            else:
+                total = Group(rollups.config['metrics'])
+                groups = {}
+                for timestamp, keys, amounts in rollups.facts.values():
+                    if timestamp is None or (start is not None and timestamp < start) or (end is not None and timestamp > end):
+                        continue
+                    total.add(amounts)
+                    if group_by:
+                        key = keys[group_by]
+                        if key is None and group_by in PERIODS:
+                            continue
+                        if key not in groups:
+                            groups[key] = Group(rollups.config['metrics'])
+                        groups[key].add(amounts)
+
+            ordered = sorted(groups.items(), key=lambda item: (item[0] is None, str(item[0])))
+            return {
+                "source": source,
+                "groupBy": group_by,
+                "metric": metric,
+                "total": total.summary(metric, percentiles),
+                "groups": [dict(key=key, **group.summary(metric, percentiles)) for key, group in ordered],
+            }
+
+    def group_sum(self, source, dimension, keys, metric='amount'):
+        """Sum of a metric over the given groups of a dimension"""
+        self.refresh(source)
+        with self.lock:
+            groups = self.rollups[source].groups[dimension]
+            return round(sum(groups[key].sums[metric] for key in keys if key in groups), 2)
+
+    def total_sum(self, source, metric='amount'):
+        self.refresh(source)
+        with self.lock:
+            return round(self.rollups[source].total.sums[metric], 2)
+
+
+# Payout statuses counted as not yet paid out
+PENDING_PAYOUT_STATUSES = ('pending', 'in progress', 'processing')
+
+
+def payout_statistics(template, now=None):
+    """Fill the payoutStatistics cards (titles, icons, tooltips) with figures from the payout rollups"""
+    month = (now or datetime.now(timezone.utc)).strftime('%Y-%m')
+    figures = {
+        1: finance_index.total_sum('payouts'),
+        2: finance_index.group_sum('payouts', 'month', [month]),
+        3: finance_index.group_sum('payouts', 'status', PENDING_PAYOUT_STATUSES),
+        4: finance_index.group_sum('payouts', 'status', ['scheduled']),
+    }
+    return [dict(card, price=figures[card.get('id')]) if card.get('id') in figures else card for card in template]
+
+
+finance_index = FinanceIndex()
+storage.add_write_listener(finance_index.on_write)
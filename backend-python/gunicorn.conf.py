@@ -0,0 +1,39 @@
+"""
+Gunicorn configuration for the DeHack backend
+Loads the app and warms every dataset in the master process before workers
+are forked, so all workers share the loaded pages copy-on-write instead of
+each parsing the data files on first use.
+
+Workers run asgi:application on uvicorn, so /api/stream clients wait on the
+event loop instead of each occupying a worker. Sync workers (app:app with
+GUNICORN_WORKER_CLASS=sync) still serve everything else but refuse streams.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8080)}"
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+
+# Import app.py once in the master; workers inherit it through fork
+preload_app = True
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before any worker is forked"""
+    import app
+    app.warm_up()
+    # Move everything loaded so far out of the collector's reach, so gc passes in
+    # the workers do not write to (and un-share) the inherited pages
+    gc.freeze()
+    server.log.info("Datasets warmed up in master; forking workers")
+
+
+def post_worker_init(worker):
+    """A sync worker serves one request at a time, so it must not hold SSE streams open"""
+    from gunicorn.workers.sync import SyncWorker
+    if isinstance(worker, SyncWorker):
+        import app
+        app.STREAMS_ENABLED = False
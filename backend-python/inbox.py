@@ -0,0 +1,107 @@
+"""
+DeHack Platform - Per-recipient inboxes
+Notifications and messages are sharded by recipientId (see storage.py), so
+each user's inbox is its own small file and its record and unread counts
+sit in counter files (slot = user id). Reading the unread badge never opens
+an inbox, a page only reads the one recipient's shard, and marking items
+read rewrites only that shard.
+
+Records without a recipient (the platform-wide ones from before inboxes)
+live in the shared '_' shard. Pages are newest first; the id of the last
+item on a page is the cursor for the next (?before=<id>). Ids are handed
+out in creation order, so id order is time order.
+
+A fan-out (one notification to every participant of a hackathon) creates
+one record per recipient and commits them with a single create_records:
+one write per inbox, its count slots and one manifest write, under one lock.
+"""
+
+import bisect
+import os
+from datetime import datetime
+
+import storage
+
+# Datasets with per-recipient inboxes
+INBOX_DATASETS = ('notifications', 'messages')
+
+# Items per page, default and maximum
+INBOX_PAGE_SIZE = int(os.getenv('INBOX_PAGE_SIZE', 20))
+INBOX_MAX_PAGE_SIZE = int(os.getenv('INBOX_MAX_PAGE_SIZE', 100))
+
+# Application statuses that make a user a participant of a hackathon
+PARTICIPANT_STATUSES = ('accepted',)
+
+
+def counters(dataset, recipient_id):
+    """{"unread", "total"} for one inbox, read from its count slots"""
+    entry = storage.shard_info(dataset, recipient_id)
+    return {"unread": entry.get('unread', 0), "total": entry['count']}
+
+
+def page(dataset, recipient_id, before=None, limit=INBOX_PAGE_SIZE, unread_only=False):
+    """One page of an inbox, newest first, starting below the id `before`"""
+    records = storage.load_shard(dataset, recipient_id)
+    records.sort(key=lambda r: r['id'])
+    end = len(records) if before is None else bisect.bisect_left([r['id'] for r in records], before)
+
+    # One item past the page tells whether there is a next page
+    items = []
+    for position in range(end - 1, -1, -1):
+        record = records[position]
+        if not unread_only or record.get('unread'):
+            items.append(record)
+            if len(items) > limit:
+                break
+    more = len(items) > limit
+    items = items[:limit]
+    return {
+        "items": items,
+        "nextCursor": items[-1]['id'] if more else None,
+        **counters(dataset, recipient_id),
+    }
+
+
+def mark_read(dataset, recipient_id, ids=None, up_to=None):
+    """Mark unread items read: the given ids, every id <= up_to, or all of them if neither is given
+
+    Returns the changed records; they are written back with a single save.
+    """
+    wanted = set(ids) if ids is not None else None
+    changed = []
+    for record in storage.load_shard(dataset, recipient_id):
+        if not record.get('unread'):
+            continue
+        if wanted is not None and record['id'] not in wanted:
+            continue
+        if up_to is not None and record['id'] > up_to:
+            continue
+        changed.append(dict(record, unread=False, readAt=datetime.now().isoformat()))
+    storage.save_records(dataset, changed)
+    return changed
+
+
+def hackathon_participants(hackathon_id):
+    """User ids of a hackathon's participants (accepted applicants), from its applications shard"""
+    return sorted({
+        a['hackerId'] for a in storage.load_shard('applications', hackathon_id)
+        if a.get('status') in PARTICIPANT_STATUSES and a.get('hackerId') is not None
+    })
+
+
+def deliver(dataset, fields, recipient_ids):
+    """Create one unread copy of `fields` per recipient and commit them together
+
+    With no recipients a single record without recipientId is created (a
+    platform-wide item, as before inboxes). Returns the new records.
+    """
+    timestamp = datetime.now().isoformat()
+    if not recipient_ids:
+        recipient_ids = [None]
+    records = []
+    for recipient_id in recipient_ids:
+        record = dict(fields, timestamp=timestamp, unread=True)
+        if recipient_id is not None:
+            record['recipientId'] = recipient_id
+        records.append(record)
+    return storage.create_records(dataset, records)
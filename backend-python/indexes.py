@@ -0,0 +1,227 @@
+"""
+DeHack Platform - Hackathon indexes
+In-memory secondary indexes over hackathons so list queries can sort and
+range-filter without scanning and sorting every record per request.
+
+Each sortable field keeps a list of (key, id) pairs in key order; range
+filters and sorted listings are bisect slices of it. Tags keep an inverted
+index and status keeps a set of ids per value, so the active set and the
+per-status counts are answered without a scan. The indexes are updated in
+place when this process writes a hackathon, and rebuilt when another
+worker's write changes the dataset version.
+"""
+
+import bisect
+from datetime import datetime, timezone
+
+import storage
+
+
+def parse_timestamp(value):
+    """ISO date/datetime string to epoch seconds (naive values are taken as UTC)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_until(value):
+    """Upper time bound as epoch seconds: a bare date (YYYY-MM-DD) includes the whole day"""
+    timestamp = parse_timestamp(value)
+    if timestamp is not None and isinstance(value, str) and len(value.strip()) == 10:
+        timestamp += 86399.999
+    return timestamp
+
+
+def parse_amount(value):
+    """Prize amounts are stored as strings like "1300" or "$1,300"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(str(value).replace('$', '').replace(',', '').strip())
+    except ValueError:
+        return None
+
+
+# Sortable fields and how each one's value becomes a comparable key
+SORT_FIELDS = {
+    'startDate': parse_timestamp,
+    'endDate': parse_timestamp,
+    'registrationDeadline': parse_timestamp,
+    'totalPrizePool': parse_amount,
+    'createdAt': parse_timestamp,
+}
+
+# Range query parameters: name -> (field, bound)
+RANGE_FILTERS = {
+    'startAfter': ('startDate', 'low'),
+    'startBefore': ('startDate', 'high'),
+    'endAfter': ('endDate', 'low'),
+    'endBefore': ('endDate', 'high'),
+    'deadlineAfter': ('registrationDeadline', 'low'),
+    'deadlineBefore': ('registrationDeadline', 'high'),
+    'createdAfter': ('createdAt', 'low'),
+    'createdBefore': ('createdAt', 'high'),
+    'minPrize': ('totalPrizePool', 'low'),
+    'maxPrize': ('totalPrizePool', 'high'),
+}
+
+
+def _parse_bounds(field, low, high):
+    """Parse raw inclusive range bounds for a sort field (dates as upper bounds end with their day)"""
+    parse = SORT_FIELDS[field]
+    return parse(low), (parse_until if parse is parse_timestamp else parse)(high)
+
+
+class SortedIndex:
+    """(key, id) pairs kept in key order for bisect range scans"""
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, key, record_id):
+        bisect.insort(self.entries, (key, record_id))
+
+    def remove(self, key, record_id):
+        i = bisect.bisect_left(self.entries, (key, record_id))
+        if i < len(self.entries) and self.entries[i] == (key, record_id):
+            del self.entries[i]
+
+    def slice(self, low=None, high=None):
+        """Entries with low <= key <= high (either bound optional), in key order"""
+        start = 0 if low is None else bisect.bisect_left(self.entries, (low,))
+        end = len(self.entries) if high is None else bisect.bisect_right(self.entries, (high, float('inf')))
+        return self.entries[start:end]
+
+
+class HackathonIndex(storage.DatasetIndex):
+    """Sorted, tag and status indexes over the hackathons dataset"""
+
+    dataset = 'hackathons'
+
+    def __init__(self):
+        super().__init__([self.dataset])
+        self.records = {}
+        self.order = []
+        self.keys = {}
+        self.sorted = {field: SortedIndex() for field in SORT_FIELDS}
+        self.tags = {}
+        self.statuses = {}
+
+    @property
+    def version(self):
+        return self.versions.get(self.dataset)
+
+    # Maintenance
+
+    def _add(self, record):
+        record_id = record['id']
+        self.records[record_id] = record
+        keys = {field: parse(record.get(field)) for field, parse in SORT_FIELDS.items()}
+        self.keys[record_id] = keys
+        for field, key in keys.items():
+            if key is not None:
+                self.sorted[field].add(key, record_id)
+        for tag in record.get('tags') or []:
+            self.tags.setdefault(str(tag).lower(), set()).add(record_id)
+        self.statuses.setdefault(record.get('status'), set()).add(record_id)
+
+    def _remove(self, record_id):
+        record = self.records.pop(record_id, None)
+        if record is None:
+            return
+        for field, key in self.keys.pop(record_id).items():
+            if key is not None:
+                self.sorted[field].remove(key, record_id)
+        for tag in record.get('tags') or []:
+            ids = self.tags.get(str(tag).lower())
+            if ids is not None:
+                ids.discard(record_id)
+        self.statuses.get(record.get('status'), set()).discard(record_id)
+
+    def _rebuild(self, dataset, records):
+        self.records, self.keys, self.tags, self.statuses = {}, {}, {}, {}
+        self.sorted = {field: SortedIndex() for field in SORT_FIELDS}
+        self.order = [record['id'] for record in records]
+        for record in records:
+            self._add(record)
+
+    def _upsert(self, dataset, record):
+        if record['id'] in self.records:
+            self._remove(record['id'])
+        else:
+            self.order.append(record['id'])
+        self._add(record)
+
+    # Queries
+
+    def get(self, record_id):
+        self.refresh()
+        return self.records.get(record_id)
+
+    def with_status(self, status):
+        """Records with the given status, in dataset order"""
+        self.refresh()
+        with self.lock:
+            ids = self.statuses.get(status, set())
+            return [self.records[i] for i in self.order if i in ids]
+
+    def status_counts(self):
+        """Number of hackathons per status"""
+        self.refresh()
+        with self.lock:
+            return {status: len(ids) for status, ids in self.statuses.items() if ids}
+
+    def query(self, sort=None, descending=False, ranges=None, tags=None, status=None, predicate=None):
+        """Return matching records.
+
+        sort: a SORT_FIELDS name; records without a value for it come last
+        ranges: {field: (low, high)} with raw (unparsed) inclusive bounds
+        tags: records must carry every listed tag
+        status: only records with this status
+        predicate: extra per-record filter applied to the remaining candidates
+        """
+        self.refresh()
+        with self.lock:
+            candidates = None
+            if status is not None:
+                candidates = set(self.statuses.get(status, set()))
+            for field, (low, high) in (ranges or {}).items():
+                ids = {record_id for _, record_id in self.sorted[field].slice(*_parse_bounds(field, low, high))}
+                candidates = ids if candidates is None else candidates & ids
+            for tag in tags or []:
+                ids = self.tags.get(tag.lower(), set())
+                candidates = set(ids) if candidates is None else candidates & ids
+
+            if sort:
+                # Walk the sort field's index (only the requested slice when it is also range-filtered)
+                low, high = (ranges or {}).get(sort, (None, None))
+                entries = self.sorted[sort].slice(*_parse_bounds(sort, low, high))
+                ordered = [record_id for _, record_id in entries]
+                if descending:
+                    ordered.reverse()
+                if sort not in (ranges or {}):
+                    seen = set(ordered)
+                    ordered.extend(record_id for record_id in self.order if record_id not in seen)
+            else:
+                ordered = self.order
+
+            results = []
+            for record_id in ordered:
+                if candidates is not None and record_id not in candidates:
+                    continue
+                record = self.records[record_id]
+                if predicate is None or predicate(record):
+                    results.append(record)
+            return results
+
+
+hackathon_index = HackathonIndex()
+storage.add_write_listener(hackathon_index.on_write)
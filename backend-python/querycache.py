@@ -0,0 +1,142 @@
+"""
+DeHack Platform - Query result cache
+Keeps the serialized responses of filtered list endpoints, so the same
+query repeated with identical parameters is answered without filtering,
+paginating and encoding again.
+
+Entries are keyed by endpoint, URL arguments and the normalized query string
+(parameters sorted, so ?a=1&b=2 and ?b=2&a=1 share an entry), and remember
+the version (storage.dataset_version) of every dataset the handler reads. A
+lookup whose versions no longer match is a miss, so any write - from this
+worker or another - invalidates the affected entries without explicit
+purging. The cache is a per-process LRU bounded by entry count and total
+bytes; entries also expire after QUERY_CACHE_TTL seconds, which covers
+time-dependent results.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+
+import storage
+
+# Bounds per worker process (0 disables the cache)
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', 512))
+QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', 30))
+
+
+class QueryCache:
+    """LRU/TTL cache of response bodies with dataset-version invalidation"""
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, max_bytes=QUERY_CACHE_MAX_BYTES, ttl=QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.invalidations = self.expirations = self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _key(self):
+        query = tuple(sorted(request.args.items(multi=True)))
+        view_args = tuple(sorted((request.view_args or {}).items()))
+        return (request.endpoint, view_args, query)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self.bytes -= len(entry[2])
+
+    def get(self, key, versions, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry_versions, expires, body, status, mimetype = entry
+            if entry_versions != versions:
+                self._drop(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            if expires <= now:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body, status, mimetype
+
+    def put(self, key, versions, now, body, status, mimetype):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (versions, now + self.ttl, body, status, mimetype)
+            self.bytes += len(body)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def cached(self, *datasets):
+        """Decorate a GET view whose response depends only on its arguments and these datasets"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                # Versions are taken before the handler reads, so a concurrent write can only
+                # leave behind an entry that is already stale
+                now = time.time()
+                key = self._key()
+                versions = tuple(storage.dataset_version(name) for name in datasets)
+                cached = self.get(key, versions, now)
+                if cached is not None:
+                    body, status, mimetype = cached
+                    response = current_app.response_class(body, status=status, mimetype=mimetype)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.put(key, versions, now, response.get_data(), response.status_code, response.mimetype)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "maxEntries": self.max_entries,
+                "maxBytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+
+query_cache = QueryCache()
@@ -0,0 +1,377 @@
+"""
+DeHack Platform - Leader/follower replication
+Lets several pods serve the same data. One pod runs as the leader and takes
+every write; the others run as followers, apply the leader's changes to
+their own data directory and serve reads locally.
+
+The leader appends every dataset write (and every change feed event) to an
+ordered mutation log in REPLICATION_DIR and keeps a full snapshot next to
+it. A follower bootstraps from the snapshot, then applies the log from the
+snapshot's position onwards. Entries are whole-record or whole-dataset
+writes, or the new value of one counter slot (comment likes), so replaying
+one twice is harmless.
+
+Followers read the log either from a shared directory (REPLICATION_SOURCE
+is a path to the leader's REPLICATION_DIR) or over HTTP from the leader
+(REPLICATION_SOURCE is its base URL). Writes sent to a follower are
+forwarded to REPLICATION_LEADER_URL, and reads are refused with 503 once
+the follower falls more than REPLICATION_MAX_STALENESS seconds behind.
+"""
+
+import fcntl
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from flask import jsonify, request, Response
+
+import codec
+import storage
+from changelog import ChangeLog
+
+# '' (single pod), 'leader' or 'follower'
+REPLICATION_ROLE = os.getenv('REPLICATION_ROLE', '').lower()
+
+# Where a leader writes its mutation log and snapshot
+REPLICATION_DIR = os.getenv('REPLICATION_DIR', os.path.join(storage.DATA_DIR, 'replication'))
+
+# Where a follower reads them from: the leader's base URL or its REPLICATION_DIR
+REPLICATION_SOURCE = os.getenv('REPLICATION_SOURCE', '')
+
+# Where a follower forwards writes (defaults to REPLICATION_SOURCE when that is a URL)
+REPLICATION_LEADER_URL = os.getenv(
+    'REPLICATION_LEADER_URL',
+    REPLICATION_SOURCE if REPLICATION_SOURCE.startswith(('http://', 'https://')) else ''
+)
+
+REPLICATION_POLL_INTERVAL = float(os.getenv('REPLICATION_POLL_INTERVAL', 0.5))
+REPLICATION_MAX_STALENESS = float(os.getenv('REPLICATION_MAX_STALENESS', 10.0))
+REPLICATION_BATCH_SIZE = int(os.getenv('REPLICATION_BATCH_SIZE', 500))
+
+# Follower progress, shared by all workers of the pod
+POSITION_PATH = storage.state_path('replica.position.json')
+
+# Requests a follower always serves itself
+LOCAL_PATHS = ('/', '/ready')
+
+
+class PositionLost(Exception):
+    """The follower's log position is no longer retained by the leader"""
+
+
+# Leader
+
+mutation_log = ChangeLog(os.path.join(REPLICATION_DIR, 'mutations.log'))
+SNAPSHOT_PATH = os.path.join(REPLICATION_DIR, 'snapshot.json')
+SNAPSHOT_POSITION_PATH = os.path.join(REPLICATION_DIR, 'snapshot.position')
+
+# Log generation covered by the latest snapshot, as last seen by this process
+_snapshot_generation = None
+
+
+def build_snapshot():
+    """Capture every dataset and counter file; the position is taken first so replay from it is complete"""
+    position = mutation_log.head()
+    return {
+        "position": position,
+        "createdAt": time.time(),
+        "datasets": {name: storage.load_data(name) for name in storage.dataset_names()},
+        "counters": {
+            name: {str(slot): value for slot, value in storage.counter(name).values().items()}
+            for name in storage.counter_names()
+        },
+    }
+
+
+def write_snapshot():
+    """Write a snapshot file for followers reading from the shared directory"""
+    global _snapshot_generation
+    with storage.file_lock(SNAPSHOT_PATH):
+        snapshot = build_snapshot()
+        storage.write_json(SNAPSHOT_PATH, snapshot)
+        with open(SNAPSHOT_POSITION_PATH, 'w') as f:
+            f.write(snapshot['position'])
+    _snapshot_generation = snapshot['position'].split(':', 1)[0]
+    print(f"Replication snapshot written at {snapshot['position']}")
+
+
+def _snapshot_covers(generation):
+    global _snapshot_generation
+    if _snapshot_generation != generation:
+        try:
+            with open(SNAPSHOT_POSITION_PATH) as f:
+                _snapshot_generation = f.read().split(':', 1)[0]
+        except FileNotFoundError:
+            _snapshot_generation = None
+    return _snapshot_generation == generation
+
+
+def record_mutation(op, filename, key, value):
+    """Storage write listener: append the write to the mutation log
+
+    Runs under the dataset's write lock, so one dataset's entries are logged
+    in the order the writes reached disk.
+    """
+    event_id = mutation_log.append({"op": op, "dataset": filename, "key": key, "value": value})
+    # A new log generation means the rotated-out entries are only covered by a new snapshot
+    if not _snapshot_covers(event_id.split(':', 1)[0]):
+        write_snapshot()
+
+
+def record_event(event_id, event):
+    """Change feed listener: replicate feed events so follower streams see them too"""
+    mutation_log.append({"op": "event", "dataset": event.get('dataset'), "key": None, "value": event})
+
+
+# Follower
+
+class DirectorySource:
+    """Reads the leader's log and snapshot from a shared directory"""
+
+    def __init__(self, path):
+        self.log = ChangeLog(os.path.join(path, 'mutations.log'))
+        self.snapshot_path = os.path.join(path, 'snapshot.json')
+
+    def read_after(self, position, limit):
+        if position and not self.log.retains(position):
+            raise PositionLost(position)
+        return self.log.read_after(position, limit)
+
+    def snapshot(self):
+        with open(self.snapshot_path, 'rb') as f:
+            return codec.loads(f.read())
+
+
+class HttpSource:
+    """Reads the leader's log and snapshot over HTTP"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def _get(self, path):
+        with urllib.request.urlopen(f"{self.url}{path}", timeout=30) as response:
+            return codec.loads(response.read())
+
+    def read_after(self, position, limit):
+        query = urllib.parse.urlencode({"after": position or '', "limit": limit})
+        try:
+            page = self._get(f"/api/replication/log?{query}")
+        except urllib.error.HTTPError as e:
+            if e.code == 410:
+                raise PositionLost(position)
+            raise
+        return [tuple(entry) for entry in page['entries']], page['cursor']
+
+    def snapshot(self):
+        return self._get("/api/replication/snapshot")
+
+
+_position_cache = (None, None)
+
+
+def read_position():
+    """Return the follower's {"position", "syncedAt"} state, or None before bootstrap"""
+    global _position_cache
+    signature = storage.file_signature(POSITION_PATH)
+    if signature is None:
+        return None
+    if _position_cache[0] != signature:
+        with open(POSITION_PATH, 'rb') as f:
+            _position_cache = (signature, codec.loads(f.read()))
+    return _position_cache[1]
+
+
+def write_position(position, synced_at):
+    storage.write_json(POSITION_PATH, {"position": position, "syncedAt": synced_at})
+
+
+def replica_lag():
+    """Seconds since this follower was last caught up with the leader (None before bootstrap)"""
+    state = read_position()
+    if not state or state.get('syncedAt') is None:
+        return None
+    return max(0.0, time.time() - state['syncedAt'])
+
+
+class Follower:
+    """Background applier; one worker per pod holds the applier lock and does the work"""
+
+    def __init__(self, source, change_log):
+        self.source = source
+        self.change_log = change_log
+        self.thread = None
+
+    def start(self):
+        """Start the background thread (once per worker process)"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='dehack-replica', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        with open(os.path.join(storage.DATA_DIR, 'replica.lock'), 'a') as lock:
+            while True:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    time.sleep(5)  # another worker on this pod is applying
+            print(f"Replica applying changes from {REPLICATION_SOURCE}")
+            while True:
+                try:
+                    self.sync_once()
+                except Exception as e:
+                    print(f"Replication sync failed: {e}")
+                time.sleep(REPLICATION_POLL_INTERVAL)
+
+    def bootstrap(self):
+        snapshot = self.source.snapshot()
+        for name, records in snapshot['datasets'].items():
+            storage.save_data(name, records)
+        for name, values in snapshot.get('counters', {}).items():
+            storage.counter(name).write_all({int(slot): value for slot, value in values.items()})
+        write_position(snapshot['position'], None)
+        print(f"Replica bootstrapped from snapshot at {snapshot['position']}")
+        return snapshot['position']
+
+    def apply(self, entry):
+        op, name, key, value = entry['op'], entry.get('dataset'), entry.get('key'), entry['value']
+        if op == 'save_data':
+            storage.save_data(name, value)
+        elif op == 'save_record':
+            storage.save_record(name, value)
+        elif op == 'save_records':
+            storage.save_records(name, value)
+        elif op == 'save_shard':
+            storage.save_shard(name, key, value)
+        elif op == 'set_counter':
+            storage.counter(name).set(key, value)
+        elif op == 'event':
+            self.change_log.append(value)
+
+    def sync_once(self):
+        state = read_position()
+        position = state['position'] if state else self.bootstrap()
+        while True:
+            started = time.time()
+            try:
+                entries, cursor = self.source.read_after(position, REPLICATION_BATCH_SIZE)
+            except PositionLost:
+                position = self.bootstrap()
+                continue
+            for _, entry in entries:
+                self.apply(entry)
+            position = cursor
+            caught_up = len(entries) < REPLICATION_BATCH_SIZE
+            write_position(position, started if caught_up else (read_position() or {}).get('syncedAt'))
+            if caught_up:
+                return
+
+
+def proxy_to_leader():
+    """Forward a write received by a follower to the leader and relay its response"""
+    if not REPLICATION_LEADER_URL:
+        return jsonify({"error": "This replica is read-only"}), 503
+
+    url = REPLICATION_LEADER_URL.rstrip('/') + request.full_path.rstrip('?')
+    headers = {k: v for k, v in request.headers.items() if k.lower() in ('content-type', 'authorization', 'accept')}
+    forwarded = urllib.request.Request(url, data=request.get_data(), headers=headers, method=request.method)
+    try:
+        with urllib.request.urlopen(forwarded, timeout=60) as upstream:
+            status, body, upstream_headers = upstream.status, upstream.read(), upstream.headers
+    except urllib.error.HTTPError as e:
+        status, body, upstream_headers = e.code, e.read(), e.headers
+    except urllib.error.URLError as e:
+        return jsonify({"error": f"Leader unavailable: {e.reason}"}), 503
+
+    response = Response(body, status=status, content_type=upstream_headers.get('Content-Type'))
+    if upstream_headers.get('Location'):
+        response.headers['Location'] = upstream_headers['Location']
+    return response
+
+
+def fetch_upload(filename, upload_dir):
+    """On a follower, copy an upload that only exists on the leader; returns True if fetched"""
+    if REPLICATION_ROLE != 'follower' or not REPLICATION_LEADER_URL:
+        return False
+    url = f"{REPLICATION_LEADER_URL.rstrip('/')}/uploads/{urllib.parse.quote(filename)}"
+    try:
+        with urllib.request.urlopen(url, timeout=30) as upstream:
+            storage.write_bytes(os.path.join(upload_dir, filename), upstream.read())
+        return True
+    except urllib.error.URLError:
+        return False
+
+
+# Flask wiring
+
+def init_app(app, change_log):
+    """Register replication routes and hooks for the configured role"""
+    follower = None
+
+    if REPLICATION_ROLE == 'leader':
+        os.makedirs(REPLICATION_DIR, exist_ok=True)
+        storage.add_write_listener(record_mutation)
+        change_log.add_listener(record_event)
+    elif REPLICATION_ROLE == 'follower':
+        if REPLICATION_SOURCE.startswith(('http://', 'https://')):
+            source = HttpSource(REPLICATION_SOURCE)
+        else:
+            source = DirectorySource(REPLICATION_SOURCE)
+        follower = Follower(source, change_log)
+
+    @app.before_request
+    def replication_before_request():
+        if REPLICATION_ROLE == 'leader' and not os.path.exists(SNAPSHOT_POSITION_PATH):
+            write_snapshot()
+        if REPLICATION_ROLE != 'follower':
+            return None
+
+        follower.start()
+        if request.path.startswith('/api/replication') or request.path in LOCAL_PATHS:
+            return None
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return proxy_to_leader()
+
+        lag = replica_lag()
+        if lag is None or lag > REPLICATION_MAX_STALENESS:
+            return jsonify({"error": "Replica is behind the leader", "lag": lag}), 503
+        return None
+
+    @app.after_request
+    def replication_after_request(response):
+        if REPLICATION_ROLE == 'follower':
+            lag = replica_lag()
+            response.headers['X-Replica-Lag'] = f"{lag:.3f}" if lag is not None else 'unknown'
+        return response
+
+    @app.route('/api/replication/status', methods=['GET'])
+    def replication_status():
+        status = {"role": REPLICATION_ROLE or 'standalone'}
+        if REPLICATION_ROLE == 'leader':
+            status["head"] = mutation_log.head()
+        elif REPLICATION_ROLE == 'follower':
+            status["source"] = REPLICATION_SOURCE
+            status["position"] = (read_position() or {}).get('position')
+            status["lag"] = replica_lag()
+        return jsonify(status)
+
+    @app.route('/api/replication/log', methods=['GET'])
+    def replication_log():
+        """Mutation log entries after ?after=<position>; 410 once that position is rotated away"""
+        if REPLICATION_ROLE != 'leader':
+            return jsonify({"error": "Not a replication leader"}), 404
+        after = request.args.get('after') or None
+        limit = min(int(request.args.get('limit', REPLICATION_BATCH_SIZE)), 5000)
+        if after and not mutation_log.retains(after):
+            return jsonify({"error": "Position no longer retained", "head": mutation_log.head()}), 410
+        entries, cursor = mutation_log.read_after(after, limit)
+        return jsonify({"entries": entries, "cursor": cursor})
+
+    @app.route('/api/replication/snapshot', methods=['GET'])
+    def replication_snapshot():
+        if REPLICATION_ROLE != 'leader':
+            return jsonify({"error": "Not a replication leader"}), 404
+        return jsonify(build_snapshot())
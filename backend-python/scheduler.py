@@ -0,0 +1,135 @@
+"""
+DeHack Platform - Hackathon status scheduler
+Moves hackathons through their lifecycle on time: scheduled -> active at
+startDate, active -> completed at endDate.
+
+Each worker keeps a min-heap of (transition time, id) built from the
+hackathon index, so a tick only looks at the heap top and does nothing
+until a transition is due. Due transitions are applied together in one
+save_records of just the changed hackathons, under the dataset's write lock
+(the one every hackathon write takes) so neither other workers' schedulers
+nor concurrent edits are lost; the write updates the index's status sets
+(the active set and per-status counts) through the storage write listener.
+"""
+
+import heapq
+import os
+import threading
+import time
+from datetime import datetime
+
+import storage
+from indexes import parse_timestamp
+
+# Longest the background thread sleeps between checks (new hackathons and
+# edits made by other workers are picked up at the next check)
+SCHEDULER_MAX_SLEEP = float(os.getenv('SCHEDULER_MAX_SLEEP', 30))
+
+# Statuses the scheduler advances; anything else (draft, cancelled, ...) is left alone
+SCHEDULED_STATUSES = ('scheduled', 'active')
+
+
+def due_status(record, now):
+    """Status the record should have at `now`, or None if the scheduler does not manage it"""
+    status = record.get('status')
+    if status not in SCHEDULED_STATUSES:
+        return None
+    end = parse_timestamp(record.get('endDate'))
+    if end is not None and now >= end:
+        return 'completed'
+    start = parse_timestamp(record.get('startDate'))
+    if status == 'scheduled' and start is not None and now >= start:
+        return 'active'
+    return status
+
+
+def next_transition(record):
+    """Epoch seconds of the record's next status change, or None"""
+    status = record.get('status')
+    start = parse_timestamp(record.get('startDate'))
+    end = parse_timestamp(record.get('endDate'))
+    if status == 'scheduled':
+        times = [t for t in (start, end) if t is not None]
+        return min(times) if times else None
+    if status == 'active':
+        return end
+    return None
+
+
+class StatusScheduler:
+    """Applies due status transitions to the hackathons dataset"""
+
+    def __init__(self, index):
+        self.index = index
+        self.lock = threading.Lock()
+        self.heap = []
+        self.version = None
+        self.thread = None
+
+    def _rebuild(self):
+        """Rebuild the heap from the index (caller holds self.lock)"""
+        with self.index.lock:
+            heap = []
+            for record_id, record in self.index.records.items():
+                when = next_transition(record)
+                if when is not None:
+                    heap.append((when, record_id))
+            self.version = self.index.version
+        heapq.heapify(heap)
+        self.heap = heap
+
+    def next_due(self):
+        """Epoch seconds of the earliest pending transition, or None"""
+        self.index.refresh()
+        with self.lock:
+            if self.version != self.index.version:
+                self._rebuild()
+            return self.heap[0][0] if self.heap else None
+
+    def tick(self, now=None):
+        """Apply every transition due by `now`; returns the number of hackathons changed"""
+        now = time.time() if now is None else now
+        self.index.refresh()
+        with self.lock:
+            if self.version != self.index.version:
+                self._rebuild()
+            due = set()
+            while self.heap and self.heap[0][0] <= now:
+                due.add(heapq.heappop(self.heap)[1])
+        if not due:
+            return 0
+        return self._apply(due, now)
+
+    def _apply(self, ids, now):
+        """Write all due transitions in one batch"""
+        with storage.dataset_lock('hackathons'):
+            # Re-read under the lock: another worker may have applied them already
+            changed = []
+            timestamp = datetime.now().isoformat()
+            for record in storage.load_data('hackathons'):
+                if record.get('id') not in ids:
+                    continue
+                status = due_status(record, now)
+                if status and status != record.get('status'):
+                    changed.append(dict(record, status=status, updatedAt=timestamp))
+            storage.save_records('hackathons', changed)
+        if changed:
+            print(f"Status scheduler: {len(changed)} hackathon(s) transitioned")
+        return len(changed)
+
+    def start(self):
+        """Start the background thread (once per worker process)"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='dehack-scheduler', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.tick()
+                due = self.next_due()
+            except Exception as e:
+                print(f"Status scheduler failed: {e}")
+                due = None
+            wait = SCHEDULER_MAX_SLEEP if due is None else due - time.time()
+            time.sleep(min(max(wait, 0.5), SCHEDULER_MAX_SLEEP))
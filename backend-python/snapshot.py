@@ -0,0 +1,197 @@
+"""
+DeHack Platform - Binary snapshot store
+One file per dataset holding each record as a separately encoded blob plus
+an offset index keyed by record id. Files are read through mmap, so looking
+up or updating a single record only touches that record's bytes.
+
+Layout:
+    header   MAGIC | index offset (u64) | index count (u64) | next id (u64)
+    records  length (u32) + encoded record, appended in write order
+    index    (id i64, offset u64, length u32) per live record, in dataset order
+
+Updating a record appends the new blob and a fresh index, then flips the
+header; the file is compacted once dead bytes outweigh live ones.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+import codec
+
+MAGIC = b"DHSNAP01"
+HEADER = struct.Struct('<8sQQQ')
+ENTRY = struct.Struct('<qQI')
+LENGTH = struct.Struct('<I')
+
+# State of a store whose file does not exist
+_EMPTY = (None, None, [], {}, 1)
+
+
+class SnapshotStore:
+    """Record store for a single dataset snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        # (signature, map, order, index, next id), replaced as a whole so a
+        # reader never pairs one version's index with another version's map
+        self._state = _EMPTY
+        self._refresh_lock = threading.Lock()
+
+    # Reading
+
+    def _refresh(self):
+        """Remap the file if another writer (or process) changed it; returns the current state"""
+        state = self._state
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            self._state = _EMPTY
+            return _EMPTY
+        try:
+            # The header is flipped last on every write, so it doubles as a version stamp
+            signature = (os.fstat(fd).st_ino, os.pread(fd, HEADER.size, 0))
+            if signature == state[0]:
+                return state
+            with self._refresh_lock:
+                # Threads that saw the same change map it once; re-read the header for the latest version
+                signature = (signature[0], os.pread(fd, HEADER.size, 0))
+                if signature == self._state[0]:
+                    return self._state
+                mapped = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+                self._state = self._load_state(signature, mapped)
+                return self._state
+        finally:
+            os.close(fd)
+
+    def _load_state(self, signature, mapped):
+        magic, index_offset, count, next_id = HEADER.unpack(signature[1])
+        if magic != MAGIC:
+            mapped.close()
+            raise ValueError(f"{self.path} is not a snapshot file")
+
+        order, index = [], {}
+        for record_id, offset, length in ENTRY.iter_unpack(mapped[index_offset:index_offset + count * ENTRY.size]):
+            order.append(record_id)
+            index[record_id] = (offset, length)
+        return (signature, mapped, order, index, next_id)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def ids(self):
+        """Record ids in dataset order"""
+        return list(self._refresh()[2])
+
+    def next_id(self):
+        return self._refresh()[4]
+
+    def __len__(self):
+        return len(self._refresh()[2])
+
+    def __contains__(self, record_id):
+        return record_id in self._refresh()[3]
+
+    def get(self, record_id):
+        """Decode a single record, or return None if it is not present"""
+        _, mapped, _, index, _ = self._refresh()
+        location = index.get(record_id)
+        if location is None:
+            return None
+        offset, length = location
+        return codec.loads(mapped[offset:offset + length])
+
+    def iter_records(self):
+        """Decode records lazily in dataset order"""
+        _, mapped, order, index, _ = self._refresh()
+        for record_id in order:
+            offset, length = index[record_id]
+            yield codec.loads(mapped[offset:offset + length])
+
+    def all(self):
+        return list(self.iter_records())
+
+    # Writing
+
+    def _lock(self):
+        handle = open(f"{self.path}.lock", 'a')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _write(self, records):
+        """Write a fresh snapshot file and swap it in (caller holds the lock)"""
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, 0, 0))
+            entries = []
+            next_id = 1
+            for record in records:
+                blob = codec.dumps(record)
+                offset = f.tell() + LENGTH.size
+                f.write(LENGTH.pack(len(blob)))
+                f.write(blob)
+                entries.append((record['id'], offset, len(blob)))
+                next_id = max(next_id, record['id'] + 1)
+            index_offset = f.tell()
+            for entry in entries:
+                f.write(ENTRY.pack(*entry))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, index_offset, len(entries), next_id))
+        os.replace(tmp_path, self.path)
+
+    def write_all(self, records):
+        """Replace the whole snapshot with the given records"""
+        with self._lock():
+            self._write(records)
+
+    def put(self, record):
+        """Insert or replace a single record without rewriting the others"""
+        self.put_many([record])
+
+    def put_many(self, records):
+        """Insert or replace several records with one append and one header flip"""
+        if not records:
+            return
+        with self._lock():
+            if not self.exists():
+                self._write(records)
+                return
+
+            _, _, order, index, next_id = self._refresh()
+            order, index = list(order), dict(index)
+
+            with open(self.path, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                chunks = []
+                position = f.tell()
+                for record in records:
+                    record_id = record['id']
+                    blob = codec.dumps(record)
+                    chunks.append(LENGTH.pack(len(blob)))
+                    chunks.append(blob)
+                    if record_id not in index:
+                        order.append(record_id)
+                    index[record_id] = (position + LENGTH.size, len(blob))
+                    position += LENGTH.size + len(blob)
+                    next_id = max(next_id, record_id + 1)
+                f.write(b''.join(chunks))
+                index_offset = f.tell()
+                f.write(b''.join(ENTRY.pack(rid, *index[rid]) for rid in order))
+                f.flush()
+                os.fsync(f.fileno())
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, index_offset, len(order), next_id))
+                file_size = index_offset + len(order) * ENTRY.size
+
+            live = sum(length + LENGTH.size for _, length in index.values())
+            if file_size > 2 * (live + HEADER.size + len(order) * ENTRY.size):
+                self._refresh()
+                self._write(self.all())
+
+    def compact(self):
+        """Rewrite the file with only live records"""
+        with self._lock():
+            self._refresh()
+            self._write(self.all())
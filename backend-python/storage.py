@@ -0,0 +1,955 @@
+"""
+DeHack Platform - Dataset storage
+Every route reads and writes datasets through these helpers. Most datasets
+are plain JSON files; datasets listed in SNAPSHOT_DATASETS live in a binary
+snapshot (see snapshot.py) so single records can be read and written
+without decoding the whole file.
+
+Datasets listed in SHARDED_DATASETS are split by hackathonId (recipientId
+for inboxes, discussion scope for comments) into one file per key under
+data/<name>/, with a small manifest.json recording the shards, their sizes
+and the next id. Reads and writes scoped to one hackathon, recipient or
+discussion only touch that shard. Datasets in SHARD_COUNTERS (the inboxes)
+have a shard per user, so their per-shard sizes are not kept in the
+manifest: the record count and the number of records with the flag set
+(e.g. unread) of each numbered shard live in two counter files,
+data/<name>-count.counters and data/<name>-<flag>.counters, with the
+recipient id as slot. Either way a shard's size is known without opening it.
+
+Which shard holds each record id is kept in an append-only locations log
+(data/<name>/locations.<n>.log, one [id, shard] line per insert or move),
+so a write appends only the lines for the ids it placed. Each process keeps
+the map in memory and reads just the lines appended since it last looked.
+The manifest names the current generation n; once superseded lines
+outnumber live ones the log is rewritten as generation n + 1.
+
+New records get their ids from create_record/create_records, which hold
+the dataset lock from reading the next id until the records are written.
+"""
+
+import fcntl
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+
+import codec
+from snapshot import SnapshotStore
+
+# Data directory
+DATA_DIR = "data"
+
+# Ensure data directory exists
+os.makedirs(DATA_DIR, exist_ok=True)
+
+
+# Internal state files (sweeper progress, replica position), kept out of the dataset namespace
+STATE_DIR = os.path.join(DATA_DIR, 'state')
+
+
+def state_path(name):
+    """Path of an internal state file, moving a copy left in DATA_DIR by older versions"""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = os.path.join(STATE_DIR, name)
+    legacy = os.path.join(DATA_DIR, name)
+    if os.path.exists(legacy) and not os.path.exists(path):
+        try:
+            os.replace(legacy, path)
+        except FileNotFoundError:
+            pass  # another worker moved it first
+    return path
+
+
+def _env_set(name, default):
+    return {item.strip() for item in os.getenv(name, default).split(',') if item.strip()}
+
+# Datasets stored as binary snapshots (comma-separated, empty to disable)
+SNAPSHOT_DATASETS = _env_set('SNAPSHOT_DATASETS', 'projects')
+
+# Datasets sharded by hackathon (comma-separated, empty to disable)
+SHARDED_DATASETS = _env_set('SHARDED_DATASETS', 'projects,sponsors,applications,notifications,messages,comments')
+
+# Field used to pick a record's shard, and the datasets sharded by another field
+SHARD_KEY = 'hackathonId'
+SHARD_KEYS = {'notifications': 'recipientId', 'messages': 'recipientId', 'comments': 'scope'}
+
+# Flag fields counted per shard in the manifest (records where the field is truthy)
+SHARD_COUNTERS = {'notifications': 'unread', 'messages': 'unread'}
+
+# Raw bytes per JSON data file, keyed by path and file signature
+_raw_cache = {}
+
+# Open snapshot stores per file path
+_snapshots = {}
+
+# Parsed manifests per sharded dataset, keyed by the raw bytes they were parsed from
+_manifests = {}
+
+# Record locations per sharded dataset: {'generation', 'offset', 'lines', 'map': {id: shard}}
+_locations = {}
+_locations_lock = threading.Lock()
+
+# Rewrite a locations log once it has this many lines and more than twice the live ids
+LOCATIONS_COMPACT_MIN = int(os.getenv('LOCATIONS_COMPACT_MIN', 1000))
+
+# Lock paths held by the current thread (file_lock is re-entrant per thread)
+_held_locks = threading.local()
+
+# Callbacks run after every dataset write, still under the dataset lock so they see
+# one dataset's writes in the order they reached disk, as callback(op, filename, key, value):
+#   ('save_data', name, None, records), ('save_record', name, record id, record),
+#   ('save_records', name, None, records), ('save_shard', name, hackathon id, records),
+#   ('set_counter', counter file name, slot, value)
+_write_listeners = []
+
+
+def add_write_listener(callback):
+    """Register a callback run after every dataset write made by this process"""
+    _write_listeners.append(callback)
+
+
+def _notify_write(op, filename, key, value):
+    for listener in _write_listeners:
+        listener(op, filename, key, value)
+
+
+class DatasetIndex:
+    """Base for in-memory indexes over datasets, kept current in every process
+
+    Writes made by this process are applied in place by on_write (register
+    it with add_write_listener); writes by other processes change the
+    dataset version, and refresh() rebuilds the dataset from disk. A dataset
+    is first built by refresh(), so on_write ignores it until then.
+    Subclasses implement _rebuild(dataset, records) and _upsert(dataset, record).
+    """
+
+    def __init__(self, datasets):
+        self.datasets = tuple(datasets)
+        self.lock = threading.RLock()
+        self.versions = {}
+
+    def _current(self, dataset, version):
+        return dataset in self.versions and self.versions[dataset] == version
+
+    def refresh(self, dataset=None):
+        """Rebuild a dataset (every dataset when None) if it changed since it was last indexed"""
+        for name in self.datasets if dataset is None else (dataset,):
+            version = dataset_version(name)
+            if self._current(name, version):
+                continue
+            with self.lock:
+                if not self._current(name, version):
+                    self._rebuild(name, load_data(name))
+                    self.versions[name] = version
+
+    def on_write(self, op, filename, key, value):
+        """Storage write listener: apply this process's writes in place"""
+        if filename not in self.datasets:
+            return
+        with self.lock:
+            if filename not in self.versions:
+                return  # not built yet; the first refresh reads it from disk
+            if op == 'save_record':
+                self._upsert(filename, value)
+            elif op == 'save_records':
+                for record in value:
+                    self._upsert(filename, record)
+            elif op == 'save_data':
+                self._rebuild(filename, value)
+            else:
+                # Shard rewrites are rare; re-read the whole dataset
+                self._rebuild(filename, load_data(filename))
+            self.versions[filename] = dataset_version(filename)
+
+
+def file_signature(filepath):
+    """Return (inode, mtime_ns, size) for a file, or None if it does not exist"""
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def json_path(filename):
+    return os.path.join(DATA_DIR, f"{filename}.json")
+
+
+def _read_bytes(filepath):
+    """Read a file's bytes, reusing the cached copy while the file is unchanged
+
+    While the thread holds a write lock the file is always re-read: two
+    quick replaces can leave the same signature (a reused inode within one
+    mtime tick), and a read-modify-write must not start from a stale copy.
+    """
+    signature = file_signature(filepath)
+    if signature is None:
+        return None, None
+    cached = _raw_cache.get(filepath)
+    if cached and cached[0] == signature and not _held_lock_paths():
+        return signature, cached[1]
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    _raw_cache[filepath] = (signature, raw)
+    return signature, raw
+
+
+def read_raw(filename):
+    """Read a JSON data file's bytes, reusing the cached copy while the file is unchanged"""
+    return _read_bytes(json_path(filename))
+
+
+def write_bytes(filepath, data):
+    """Write bytes to a temp file and replace the target atomically"""
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, filepath)
+
+
+def write_json(filepath, data):
+    """Write JSON compactly and replace the target atomically"""
+    write_bytes(filepath, codec.dumps(data))
+
+
+def _held_lock_paths():
+    held = getattr(_held_locks, 'paths', None)
+    if held is None:
+        held = _held_locks.paths = set()
+    return held
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock shared by all worker processes (re-entrant within a thread)"""
+    held = _held_lock_paths()
+    if path in held:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+
+
+def dataset_lock(filename):
+    """Exclusive write lock of one dataset, shared by all threads and worker processes"""
+    if filename in SHARDED_DATASETS:
+        os.makedirs(_shard_dir(filename), exist_ok=True)
+        return file_lock(_manifest_path(filename))
+    return file_lock(os.path.join(DATA_DIR, filename))
+
+
+# Counter files: data/<name>.counters, fixed-width signed integers addressed by slot
+
+_COUNTER_SLOT = struct.Struct('<q')
+
+# Open counter files per name
+_counters = {}
+
+
+class CounterFile:
+    """Fixed-width signed counters in a file, addressed by slot number
+
+    Slots past the end of the file read as 0; writing one extends the file
+    (sparsely). Updates hold an fcntl lock on the slot's bytes only, plus a
+    thread lock, as fcntl locks do not exclude threads of the same process.
+    Every update is reported to the write listeners as a 'set_counter' write
+    of the slot's new value, under that lock, so replicas apply them in order.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.join(DATA_DIR, f"{name}.counters")
+        self.lock = threading.Lock()
+        self.fd = None
+
+    def _open(self):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self.fd
+
+    def _read(self, fd, slot):
+        data = os.pread(fd, _COUNTER_SLOT.size, slot * _COUNTER_SLOT.size)
+        return _COUNTER_SLOT.unpack(data)[0] if len(data) == _COUNTER_SLOT.size else 0
+
+    def get(self, slot):
+        return self._read(self._open(), slot)
+
+    def _update(self, slot, change):
+        fd = self._open()
+        offset = slot * _COUNTER_SLOT.size
+        with self.lock:
+            fcntl.lockf(fd, fcntl.LOCK_EX, _COUNTER_SLOT.size, offset)
+            try:
+                value = change(self._read(fd, slot))
+                os.pwrite(fd, _COUNTER_SLOT.pack(value), offset)
+                _notify_write('set_counter', self.name, slot, value)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, _COUNTER_SLOT.size, offset)
+        return value
+
+    def add(self, slot, delta, floor=None):
+        """Add delta to a slot atomically across processes; the result is kept >= floor. Returns it"""
+        def change(value):
+            value += delta
+            return floor if floor is not None and value < floor else value
+        return self._update(slot, change)
+
+    def set(self, slot, value):
+        """Overwrite one slot"""
+        return self._update(slot, lambda _: value)
+
+    def values(self):
+        """{slot: value} for every non-zero slot"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        data = data[:len(data) - len(data) % _COUNTER_SLOT.size]
+        return {slot: value for slot, (value,) in enumerate(_COUNTER_SLOT.iter_unpack(data)) if value}
+
+    def write_all(self, values):
+        """Replace every slot with the given {slot: value} (other slots become 0), without notifying"""
+        size = (max(values, default=-1) + 1) * _COUNTER_SLOT.size
+        data = bytearray(size)
+        for slot, value in values.items():
+            _COUNTER_SLOT.pack_into(data, slot * _COUNTER_SLOT.size, value)
+        fd = self._open()
+        with self.lock:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                os.pwrite(fd, bytes(data), 0)
+                os.ftruncate(fd, size)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+
+
+def counter(name):
+    """The counter file data/<name>.counters"""
+    counters = _counters.get(name)
+    if counters is None:
+        counters = _counters.setdefault(name, CounterFile(name))
+    return counters
+
+
+def counter_names():
+    """Names of all counter files present in the data directory"""
+    return sorted(entry[:-len('.counters')] for entry in os.listdir(DATA_DIR) if entry.endswith('.counters'))
+
+
+# Files: one JSON file or snapshot holding a list of records
+
+def _store(base):
+    store = _snapshots.get(base)
+    if store is None:
+        store = SnapshotStore(f"{base}.snap")
+        _snapshots[base] = store
+    return store
+
+
+def _load_file(base, snapshot):
+    if snapshot:
+        return _store(base).all()
+    _, raw = _read_bytes(f"{base}.json")
+    return codec.loads(raw) if raw is not None else []
+
+
+def _save_file(base, records, snapshot):
+    if snapshot:
+        _store(base).write_all(records)
+    else:
+        write_json(f"{base}.json", records)
+
+
+def _get_in_file(base, record_id, snapshot):
+    if snapshot:
+        return _store(base).get(record_id)
+    return next((r for r in _load_file(base, False) if r.get('id') == record_id), None)
+
+
+def _put_in_file(base, record, snapshot):
+    _put_many_in_file(base, [record], snapshot)
+
+
+def _put_many_in_file(base, records, snapshot):
+    """Insert or replace records by id with a single write; returns the file's records (JSON files only)"""
+    if snapshot:
+        _store(base).put_many(records)
+        return None
+    existing = _load_file(base, False)
+    positions = {r.get('id'): i for i, r in enumerate(existing)}
+    for record in records:
+        i = positions.get(record['id'])
+        if i is None:
+            positions[record['id']] = len(existing)
+            existing.append(record)
+        else:
+            existing[i] = record
+    write_json(f"{base}.json", existing)
+    return existing
+
+
+def _remove_file(base):
+    for path in (f"{base}.snap", f"{base}.json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _legacy_records(filename):
+    """Records of a dataset stored as a single file, before it was sharded"""
+    base = os.path.join(DATA_DIR, filename)
+    if os.path.exists(f"{base}.snap"):
+        records = _store(base).all()
+    else:
+        records = _load_file(base, False)
+    return _flatten_replies(records) if filename == 'comments' else records
+
+
+def _flatten_replies(comments):
+    """Turn replies nested in a comment's 'replies' list into records of their own
+
+    Comments files from before threaded comments embed replies, with ids
+    of their own numbering. Each becomes a record with a new id and a
+    parentId, in its parent's discussion scope.
+    """
+    next_id = max((c['id'] for c in comments if isinstance(c.get('id'), int)), default=0) + 1
+    flat = []
+    pending = [(comment, None) for comment in comments]
+    while pending:
+        comment, parent = pending.pop(0)
+        replies = comment.get('replies') or []
+        record = {k: v for k, v in comment.items() if k != 'replies'}
+        if parent is not None:
+            record['id'] = next_id
+            next_id += 1
+            record['parentId'] = parent['id']
+            for field in ('scope', 'hackathonId', 'projectId'):
+                if parent.get(field) is not None:
+                    record[field] = parent[field]
+        flat.append(record)
+        pending.extend((reply, record) for reply in replies if isinstance(reply, dict))
+    return flat
+
+
+# Sharded datasets
+
+def shard_key(filename):
+    """Field that picks the shard of a dataset's records"""
+    return SHARD_KEYS.get(filename, SHARD_KEY)
+
+
+# Shard names become file names: numeric keys, the shared '_' shard and comment discussion scopes
+_SHARD_NAME = re.compile(r'\d+|_|(hackathon|project)-\d+')
+
+
+def shard_id(value):
+    """Normalise a shard key value (int, numeric string, scope or None) to a shard name
+
+    Anything else raises ValueError, so no key can name a path outside the dataset directory.
+    """
+    if isinstance(value, bool) or not (value is None or isinstance(value, (int, str))) \
+            or not _SHARD_NAME.fullmatch(_key_name(value)):
+        raise ValueError(f"Invalid shard key: {value!r}")
+    return _key_name(value)
+
+
+def _key_name(value):
+    """Shard key value as compared in datasets that are not sharded (no file path involved)"""
+    return '_' if value is None or value == '' else str(value)
+
+
+def _shard_dir(filename):
+    return os.path.join(DATA_DIR, filename)
+
+
+def _manifest_path(filename):
+    return os.path.join(_shard_dir(filename), 'manifest.json')
+
+
+def _shard_base(filename, key):
+    if not _SHARD_NAME.fullmatch(key):
+        raise ValueError(f"Invalid shard name: {key!r}")
+    return os.path.join(_shard_dir(filename), key)
+
+
+def _shard_entry(filename, records):
+    """Manifest entry for a shard holding these records"""
+    entry = {'count': len(records)}
+    counter = SHARD_COUNTERS.get(filename)
+    if counter:
+        entry[counter] = sum(1 for r in records if r.get(counter))
+    return entry
+
+
+def _counted(filename, key):
+    """Whether a shard's entry lives in the dataset's counter files rather than the manifest"""
+    return filename in SHARD_COUNTERS and key.isdigit()
+
+
+def _shard_counters(filename):
+    """Counter files of a SHARD_COUNTERS dataset: records per shard, and records with the flag set"""
+    return counter(f"{filename}-count"), counter(f"{filename}-{SHARD_COUNTERS[filename]}")
+
+
+def _set_counts(filename, key, entry):
+    """Store a numbered shard's entry in the counter files, skipping unchanged slots"""
+    for counters, value in zip(_shard_counters(filename), (entry['count'], entry[SHARD_COUNTERS[filename]])):
+        if counters.get(int(key)) != value:
+            counters.set(int(key), value)
+
+
+def _get_entry(filename, current, key):
+    """Entry of one shard, or None if it does not exist (or, when counted, holds no records)"""
+    if not _counted(filename, key):
+        return current['shards'].get(key)
+    total, flagged = _shard_counters(filename)
+    count = total.get(int(key))
+    return {'count': count, SHARD_COUNTERS[filename]: flagged.get(int(key))} if count else None
+
+
+def _put_entries(filename, current, entries):
+    """Record shard entries in the counter files or the manifest copy `current` (caller holds the lock)"""
+    shards = dict(current['shards'])
+    for key, entry in entries.items():
+        if _counted(filename, key):
+            _set_counts(filename, key, entry)
+        else:
+            shards[key] = entry
+    current['shards'] = shards
+
+
+def _all_shard_keys(filename, current):
+    """Names of the shards listed in a manifest plus, when counted, the non-empty numbered shards"""
+    keys = list(current['shards'])
+    if filename in SHARD_COUNTERS:
+        keys.extend(str(slot) for slot in _shard_counters(filename)[0].values())
+    return keys
+
+
+def _write_shards(filename, records):
+    """Split records into shards and write them with a fresh manifest (caller holds the lock)"""
+    snapshot = filename in SNAPSHOT_DATASETS
+    field = shard_key(filename)
+    shards = {}
+    for record in records:
+        shards.setdefault(shard_id(record.get(field)), []).append(record)
+
+    previous = _read_manifest(filename) or {'shards': {}}
+    for key in _all_shard_keys(filename, previous):
+        if key not in shards:
+            _remove_file(_shard_base(filename, key))
+    for key, shard_records in shards.items():
+        _save_file(_shard_base(filename, key), shard_records, snapshot)
+
+    entries = {key: _shard_entry(filename, rs) for key, rs in shards.items()}
+    if filename in SHARD_COUNTERS:
+        numbered = {int(key): entry for key, entry in entries.items() if _counted(filename, key)}
+        total, flagged = _shard_counters(filename)
+        total.write_all({slot: entry['count'] for slot, entry in numbered.items()})
+        flagged.write_all({slot: entry[SHARD_COUNTERS[filename]] for slot, entry in numbered.items()})
+
+    generation = previous.get('locations', 0) + 1
+    _write_locations(filename, generation, {r['id']: key for key, rs in shards.items() for r in rs})
+    _write_manifest(filename, {
+        'shardKey': field,
+        'nextId': max((r.get('id', 0) for r in records), default=0) + 1,
+        'shards': {key: entry for key, entry in entries.items() if not _counted(filename, key)},
+        'locations': generation,
+    })
+    _remove_locations(filename, generation)
+
+
+def _read_manifest(filename):
+    _, raw = _read_bytes(_manifest_path(filename))
+    if raw is None:
+        return None
+    cached = _manifests.get(filename)
+    if cached and cached[0] is raw:
+        return cached[1]
+    manifest = codec.loads(raw)
+    _manifests[filename] = (raw, manifest)
+    return manifest
+
+
+def _write_manifest(filename, manifest):
+    write_json(_manifest_path(filename), manifest)
+
+
+def manifest(filename):
+    """Return the shard manifest, splitting the legacy single file on first use"""
+    current = _read_manifest(filename)
+    if current is not None and 'locations' in current and not _manifest_counts(filename, current):
+        return current
+    with dataset_lock(filename):
+        current = _read_manifest(filename)
+        if current is None:
+            records = _legacy_records(filename)
+            _write_shards(filename, records)
+            print(f"Split {filename} into {len(_all_shard_keys(filename, _read_manifest(filename)))} shards by {shard_key(filename)}")
+            current = _read_manifest(filename)
+        if 'locations' not in current:
+            # Manifests written before the locations log carry the whole id -> shard map
+            records = current.pop('records', {})
+            _write_locations(filename, 1, {int(rid) if rid.isdigit() else rid: key for rid, key in records.items()})
+            _write_manifest(filename, dict(current, locations=1))
+            print(f"Moved {len(records)} {filename} record locations to locations.1.log")
+            current = _read_manifest(filename)
+        numbered = _manifest_counts(filename, current)
+        if numbered:
+            # Manifests written before the counter files list every recipient's shard
+            for key, entry in numbered.items():
+                _set_counts(filename, key, entry)
+            _write_manifest(filename, dict(current, shards={
+                key: entry for key, entry in current['shards'].items() if key not in numbered
+            }))
+            print(f"Moved {len(numbered)} {filename} shard counts to counter files")
+    return _read_manifest(filename)
+
+
+def _manifest_counts(filename, current):
+    """Entries of numbered shards still listed in a SHARD_COUNTERS dataset's manifest"""
+    if filename not in SHARD_COUNTERS:
+        return {}
+    return {key: entry for key, entry in current['shards'].items() if key.isdigit()}
+
+
+# Record locations
+
+def _locations_path(filename, generation):
+    return os.path.join(_shard_dir(filename), f"locations.{generation}.log")
+
+
+def _location_lines(entries):
+    return b''.join(codec.dumps([record_id, key]) + b"\n" for record_id, key in entries)
+
+
+def _write_locations(filename, generation, locations):
+    """Write a locations log generation holding exactly these locations (caller holds the lock)"""
+    write_bytes(_locations_path(filename, generation), _location_lines(locations.items()))
+
+
+def _remove_locations(filename, generation):
+    """Delete the locations logs older than the given generation"""
+    for entry in os.listdir(_shard_dir(filename)):
+        if entry.startswith('locations.') and entry.endswith('.log'):
+            number = entry[len('locations.'):-len('.log')]
+            if number.isdigit() and int(number) < generation:
+                os.remove(os.path.join(_shard_dir(filename), entry))
+
+
+def _record_locations(filename):
+    """id -> shard map of a sharded dataset (shared; do not modify), caught up with its log"""
+    while True:
+        generation = manifest(filename)['locations']
+        with _locations_lock:
+            cached = _locations.get(filename)
+            if cached is None or cached['generation'] != generation:
+                cached = {'generation': generation, 'offset': 0, 'lines': 0, 'map': {}}
+            try:
+                with open(_locations_path(filename, generation), 'rb') as f:
+                    f.seek(cached['offset'])
+                    data = f.read()
+            except FileNotFoundError:
+                # Compacted into a newer generation after the manifest was read
+                continue
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                record_id, key = codec.loads(line)
+                if key is None:
+                    cached['map'].pop(record_id, None)
+                else:
+                    cached['map'][record_id] = key
+            cached['lines'] += data.count(b"\n", 0, end)
+            cached['offset'] += end
+            _locations[filename] = cached
+            return cached['map']
+
+
+def _log_locations(filename, current, entries):
+    """Append [id, shard] lines for placed records, compacting the log when mostly superseded
+
+    Caller holds the lock and writes `current` as the manifest afterwards;
+    returns the generation whose older logs can then be deleted, or None.
+    """
+    if entries:
+        with open(_locations_path(filename, current['locations']), 'ab') as f:
+            f.write(_location_lines(entries))
+    locations = _record_locations(filename)
+    lines = _locations[filename]['lines']
+    if lines < LOCATIONS_COMPACT_MIN or lines <= 2 * len(locations):
+        return None
+    generation = current['locations'] + 1
+    _write_locations(filename, generation, locations)
+    current['locations'] = generation
+    return generation
+
+
+def record_shard(filename, record_id):
+    """Shard holding a record of a sharded dataset, or None"""
+    return _record_locations(filename).get(record_id)
+
+
+def shard_keys(filename):
+    """Shard names of a sharded dataset"""
+    return _all_shard_keys(filename, manifest(filename))
+
+
+def shard_info(filename, key_value):
+    """Manifest entry of one shard ({'count': 0} if it does not exist), without opening it"""
+    if filename not in SHARDED_DATASETS:
+        return _shard_entry(filename, load_shard(filename, key_value))
+    entry = _get_entry(filename, manifest(filename), shard_id(key_value))
+    return entry if entry is not None else _shard_entry(filename, [])
+
+
+def load_shard(filename, hackathon_id):
+    """Load the records belonging to one hackathon (or other shard key value)"""
+    if filename not in SHARDED_DATASETS:
+        key = _key_name(hackathon_id)
+        return [r for r in load_data(filename) if _key_name(r.get(shard_key(filename))) == key]
+    key = shard_id(hackathon_id)
+    if _get_entry(filename, manifest(filename), key) is None:
+        return []
+    return _load_file(_shard_base(filename, key), filename in SNAPSHOT_DATASETS)
+
+
+def save_shard(filename, hackathon_id, records):
+    """Replace the records belonging to one hackathon (or other shard key value)"""
+    key = shard_id(hackathon_id) if filename in SHARDED_DATASETS else _key_name(hackathon_id)
+    with dataset_lock(filename):
+        if filename not in SHARDED_DATASETS:
+            others = [r for r in load_data(filename) if _key_name(r.get(shard_key(filename))) != key]
+            _save_data(filename, others + records)
+        else:
+            current = dict(manifest(filename))
+            locations = _record_locations(filename)
+            kept = {r['id'] for r in records}
+            entries = [(rid, None) for rid, k in locations.items() if k == key and rid not in kept]
+            entries.extend((r['id'], key) for r in records if locations.get(r['id']) != key)
+            _save_file(_shard_base(filename, key), records, filename in SNAPSHOT_DATASETS)
+            compacted = _log_locations(filename, current, entries)
+            _put_entries(filename, current, {key: _shard_entry(filename, records)})
+            current['nextId'] = max([current['nextId']] + [r['id'] + 1 for r in records])
+            _write_manifest(filename, current)
+            if compacted:
+                _remove_locations(filename, compacted)
+        _notify_write('save_shard', filename, hackathon_id, records)
+
+
+def _sharded_put(filename, records):
+    """Upsert records into their shards: one write per touched shard plus one manifest write"""
+    snapshot = filename in SNAPSHOT_DATASETS
+    field = shard_key(filename)
+    with dataset_lock(filename):
+        current = dict(manifest(filename))
+        locations = _record_locations(filename)
+        entries = {}
+
+        incoming, moved, added, placed = {}, {}, {}, {}
+        for record in records:
+            key = shard_id(record.get(field))
+            previous = placed.get(record['id'], locations.get(record['id']))
+            if previous != key:
+                added[key] = added.get(key, 0) + 1
+                if previous is not None:
+                    moved.setdefault(previous, set()).add(record['id'])
+                placed[record['id']] = key
+            incoming.setdefault(key, []).append(record)
+
+        for previous, ids in moved.items():
+            # These records moved to another shard; drop them from the old one
+            old_base = _shard_base(filename, previous)
+            remaining = [r for r in _load_file(old_base, snapshot) if r['id'] not in ids]
+            _save_file(old_base, remaining, snapshot)
+            entries[previous] = _shard_entry(filename, remaining)
+
+        for key, count in added.items():
+            entries[key] = dict(entries.get(key) or _get_entry(filename, current, key) or {'count': 0})
+            entries[key]['count'] += count
+        for key, shard_records in incoming.items():
+            base = _shard_base(filename, key)
+            written = _put_many_in_file(base, shard_records, snapshot)
+            if filename in SHARD_COUNTERS:
+                entries[key] = _shard_entry(filename, written if written is not None else _load_file(base, snapshot))
+        compacted = _log_locations(filename, current, list(placed.items()))
+        _put_entries(filename, current, entries)
+        current['nextId'] = max([current['nextId']] + [r['id'] + 1 for r in records])
+        _write_manifest(filename, current)
+        if compacted:
+            _remove_locations(filename, compacted)
+
+
+# Public dataset API
+
+def dataset_exists(filename):
+    """Check whether a dataset has been created in any format"""
+    if filename in SHARDED_DATASETS and os.path.exists(_manifest_path(filename)):
+        return True
+    if filename in SNAPSHOT_DATASETS and os.path.exists(os.path.join(DATA_DIR, f"{filename}.snap")):
+        return True
+    return os.path.exists(json_path(filename))
+
+
+def dataset_version(filename):
+    """Opaque version of a dataset that changes whenever any process writes it"""
+    if filename in SHARDED_DATASETS:
+        return file_signature(_manifest_path(filename))
+    if filename in SNAPSHOT_DATASETS:
+        return file_signature(os.path.join(DATA_DIR, f"{filename}.snap"))
+    return file_signature(json_path(filename))
+
+
+def dataset_names():
+    """Names of all datasets present in the data directory"""
+    names = set()
+    for entry in os.listdir(DATA_DIR):
+        path = os.path.join(DATA_DIR, entry)
+        if entry.endswith('.json') and os.path.isfile(path):
+            names.add(entry[:-len('.json')])
+        elif entry.endswith('.snap') and entry[:-len('.snap')] in SNAPSHOT_DATASETS:
+            names.add(entry[:-len('.snap')])
+        elif entry in SHARDED_DATASETS and os.path.exists(_manifest_path(entry)):
+            names.add(entry)
+    return sorted(names)
+
+
+def snapshot_store(filename):
+    """Return the snapshot store for an unsharded dataset, seeding it from the JSON file on first use"""
+    base = os.path.join(DATA_DIR, filename)
+    store = _store(base)
+    if not store.exists():
+        _, raw = read_raw(filename)
+        store.write_all(codec.loads(raw) if raw is not None else [])
+        print(f"Seeded {filename}.snap from {filename}.json")
+    return store
+
+
+def load_data(filename):
+    """Load all records of a dataset"""
+    if filename in SHARDED_DATASETS:
+        snapshot = filename in SNAPSHOT_DATASETS
+        records = []
+        for key in shard_keys(filename):
+            records.extend(_load_file(_shard_base(filename, key), snapshot))
+        records.sort(key=lambda r: r.get('id', 0))
+        return records
+    if filename in SNAPSHOT_DATASETS:
+        return snapshot_store(filename).all()
+    _, raw = read_raw(filename)
+    if raw is None:
+        return []
+    return codec.loads(raw)
+
+
+def _save_data(filename, data):
+    if filename in SHARDED_DATASETS:
+        with dataset_lock(filename):
+            _write_shards(filename, data)
+        return
+    if filename in SNAPSHOT_DATASETS:
+        snapshot_store(filename).write_all(data)
+        return
+    write_json(json_path(filename), data)
+
+
+def save_data(filename, data):
+    """Replace all records of a dataset"""
+    with dataset_lock(filename):
+        _save_data(filename, data)
+        _notify_write('save_data', filename, None, data)
+
+
+def load_record(filename, record_id):
+    """Load a single record by id, or None if it does not exist"""
+    if filename in SHARDED_DATASETS:
+        key = record_shard(filename, record_id)
+        if key is None:
+            return None
+        return _get_in_file(_shard_base(filename, key), record_id, filename in SNAPSHOT_DATASETS)
+    if filename in SNAPSHOT_DATASETS:
+        return snapshot_store(filename).get(record_id)
+    return next((r for r in load_data(filename) if r.get('id') == record_id), None)
+
+
+def save_record(filename, record):
+    """Insert or replace a single record by id"""
+    with dataset_lock(filename):
+        if filename in SHARDED_DATASETS:
+            _sharded_put(filename, [record])
+        elif filename in SNAPSHOT_DATASETS:
+            snapshot_store(filename).put(record)
+        else:
+            _put_in_file(os.path.join(DATA_DIR, filename), record, False)
+        _notify_write('save_record', filename, record['id'], record)
+
+
+def save_records(filename, records):
+    """Insert or replace many records by id with one write per file"""
+    if not records:
+        return
+    with dataset_lock(filename):
+        if filename in SHARDED_DATASETS:
+            _sharded_put(filename, records)
+        elif filename in SNAPSHOT_DATASETS:
+            snapshot_store(filename).put_many(records)
+        else:
+            _put_many_in_file(os.path.join(DATA_DIR, filename), records, False)
+        _notify_write('save_records', filename, None, records)
+
+
+def create_records(filename, records):
+    """Insert new records under consecutive ids allocated while holding the dataset lock
+
+    Any id in the given records is replaced. Returns the stored records.
+    """
+    if not records:
+        return []
+    with dataset_lock(filename):
+        next_id = next_record_id(filename)
+        created = []
+        for offset, record in enumerate(records):
+            stored = {'id': next_id + offset}
+            stored.update((field, value) for field, value in record.items() if field != 'id')
+            created.append(stored)
+        save_records(filename, created)
+    return created
+
+
+def create_record(filename, record):
+    """Insert one new record under the next id of its dataset; returns it"""
+    return create_records(filename, [record])[0]
+
+
+def count_records(filename):
+    """Number of records in a dataset, answered from the manifest when sharded"""
+    if filename in SHARDED_DATASETS:
+        current = manifest(filename)
+        total = sum(shard['count'] for shard in current['shards'].values())
+        if filename in SHARD_COUNTERS:
+            total += sum(_shard_counters(filename)[0].values().values())
+        return total
+    if filename in SNAPSHOT_DATASETS:
+        return len(snapshot_store(filename))
+    return len(load_data(filename))
+
+
+def get_next_id(data):
+    """Get next ID for new items"""
+    if not data:
+        return 1
+    return max(item.get('id', 0) for item in data) + 1
+
+
+def next_record_id(filename):
+    """Get the next ID for a dataset without loading its records where possible"""
+    if filename in SHARDED_DATASETS:
+        return manifest(filename)['nextId']
+    if filename in SNAPSHOT_DATASETS:
+        return snapshot_store(filename).next_id()
+    return get_next_id(load_data(filename))
@@ -0,0 +1,189 @@
+"""
+DeHack Platform - Orphaned upload sweeper
+Removes files from uploads/ that no record points at any more (abandoned
+form drafts, replaced images).
+
+A reference index maps each upload filename to the records using it, taken
+from REFERENCE_FIELDS. It is built once per dataset and then kept current
+by the storage write listener; a dataset is re-read only when another
+worker's write changes its version. The sweeper walks the upload directory
+in name order, UPLOAD_GC_BATCH files per run, resuming from a cursor, and
+deletes files that are unreferenced and older than UPLOAD_GC_GRACE seconds
+(so an image uploaded just before its form is submitted is never taken).
+
+Every worker runs a sweeper thread, but only the one holding
+data/state/upload-gc.lock sweeps. Progress and the space reclaimed are kept
+in data/state/upload-gc.json so any worker can report them.
+"""
+
+import fcntl
+import os
+import re
+import threading
+import time
+
+import codec
+import storage
+from uploads import UPLOAD_DIR
+
+# Record fields holding upload URLs (a string or a list of strings), per dataset
+REFERENCE_FIELDS = {
+    'hackathons': ('image', 'logoUrl'),
+    'sponsors': ('companyLogo',),
+    'projects': ('images',),
+}
+
+# Unreferenced files younger than this are kept
+UPLOAD_GC_GRACE = float(os.getenv('UPLOAD_GC_GRACE', 24 * 3600))
+
+# Seconds between sweeper runs, and files examined per run
+UPLOAD_GC_INTERVAL = float(os.getenv('UPLOAD_GC_INTERVAL', 300))
+UPLOAD_GC_BATCH = int(os.getenv('UPLOAD_GC_BATCH', 500))
+
+STATE_PATH = storage.state_path('upload-gc.json')
+LOCK_PATH = storage.state_path('upload-gc.lock')
+
+_UPLOAD_URL = re.compile(r'(?:^|/)uploads/([^/?#]+)')
+
+
+def referenced_files(record, fields):
+    """Upload filenames referenced by a record's fields"""
+    names = set()
+    for field in fields:
+        values = record.get(field)
+        if not isinstance(values, list):
+            values = [values]
+        for value in values:
+            if isinstance(value, str):
+                match = _UPLOAD_URL.search(value)
+                if match:
+                    names.add(match.group(1))
+    return names
+
+
+class ReferenceIndex(storage.DatasetIndex):
+    """Upload filename -> number of records referencing it"""
+
+    def __init__(self, fields=REFERENCE_FIELDS):
+        super().__init__(fields)
+        self.fields = fields
+        self.counts = {}
+        self.records = {dataset: {} for dataset in fields}
+
+    def _upsert(self, dataset, record):
+        record_id = record.get('id')
+        refs = self.records[dataset]
+        for name in refs.pop(record_id, ()):
+            self.counts[name] -= 1
+            if not self.counts[name]:
+                del self.counts[name]
+        names = referenced_files(record, self.fields[dataset])
+        if names:
+            refs[record_id] = names
+            for name in names:
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _rebuild(self, dataset, records):
+        for names in self.records[dataset].values():
+            for name in names:
+                self.counts[name] -= 1
+                if not self.counts[name]:
+                    del self.counts[name]
+        self.records[dataset] = {}
+        for record in records:
+            self._upsert(dataset, record)
+
+    def is_referenced(self, name):
+        with self.lock:
+            return name in self.counts
+
+    def __len__(self):
+        with self.lock:
+            return len(self.counts)
+
+
+def read_state():
+    """Sweeper progress and totals"""
+    try:
+        with open(STATE_PATH, 'rb') as f:
+            return codec.loads(f.read())
+    except FileNotFoundError:
+        return {"cursor": "", "runs": 0, "filesRemoved": 0, "bytesReclaimed": 0, "lastRunAt": None}
+
+
+class UploadSweeper:
+    """Incrementally deletes unreferenced uploads past the grace period"""
+
+    def __init__(self, index, upload_dir=UPLOAD_DIR):
+        self.index = index
+        self.upload_dir = upload_dir
+        self.thread = None
+
+    def _next_batch(self, cursor):
+        """The next UPLOAD_GC_BATCH names after the cursor; wraps to the start at the end"""
+        with os.scandir(self.upload_dir) as entries:
+            names = sorted(entry.name for entry in entries if entry.name > cursor and entry.is_file())
+        return names[:UPLOAD_GC_BATCH]
+
+    def sweep_once(self, now=None):
+        """Examine one batch of files; returns {"scanned", "removed", "bytes"} (caller holds the lock)"""
+        now = time.time() if now is None else now
+        self.index.refresh()
+        state = read_state()
+        batch = self._next_batch(state['cursor'])
+
+        removed = reclaimed = 0
+        for name in batch:
+            path = os.path.join(self.upload_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime < UPLOAD_GC_GRACE:
+                continue
+            # Leftover temp files from interrupted uploads are never referenced
+            if not name.startswith('.upload-') and self.index.is_referenced(name):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            reclaimed += stat.st_size
+
+        state.update({
+            "cursor": batch[-1] if len(batch) == UPLOAD_GC_BATCH else "",
+            "runs": state['runs'] + 1,
+            "filesRemoved": state['filesRemoved'] + removed,
+            "bytesReclaimed": state['bytesReclaimed'] + reclaimed,
+            "lastRunAt": now,
+        })
+        storage.write_json(STATE_PATH, state)
+        if removed:
+            print(f"Upload sweeper: removed {removed} orphaned file(s), reclaimed {reclaimed} bytes")
+        return {"scanned": len(batch), "removed": removed, "bytes": reclaimed}
+
+    def start(self):
+        """Start the background thread (once per worker process)"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='dehack-upload-gc', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        with open(LOCK_PATH, 'a') as lock:
+            while True:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    time.sleep(UPLOAD_GC_INTERVAL)  # another worker is sweeping
+            while True:
+                try:
+                    self.sweep_once()
+                except Exception as e:
+                    print(f"Upload sweeper failed: {e}")
+                time.sleep(UPLOAD_GC_INTERVAL)
+
+
+upload_references = ReferenceIndex()
+storage.add_write_listener(upload_references.on_write)
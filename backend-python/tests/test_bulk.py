@@ -0,0 +1,34 @@
+"""Bulk import validation: shard keys name files, so they must be ids or scopes"""
+
+import pytest
+
+import storage
+from bulk import validate
+
+
+@pytest.mark.parametrize('value, name', [(None, '_'), ('', '_'), ('_', '_'), (7, '7'), ('7', '7'),
+                                         ('hackathon-3', 'hackathon-3'), ('project-12', 'project-12')])
+def test_shard_id_accepts_ids_and_scopes(value, name):
+    assert storage.shard_id(value) == name
+
+
+@pytest.mark.parametrize('value', ['../../../escape', '1/../../x', '.', 'hackathon-../x',
+                                   True, -1, 1.5, [1], {'a': 1}])
+def test_shard_id_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        storage.shard_id(value)
+
+
+def test_validate_requires_integer_shard_key():
+    assert validate('projects', {'hackathonId': '../../../rv_escape', 'title': 'x'}) == \
+        "hackathonId must be a non-negative integer"
+    assert validate('projects', {'hackathonId': '3', 'title': 'x'}) is not None
+    assert validate('projects', {'hackathonId': True, 'title': 'x'}) is not None
+    assert validate('projects', {'hackathonId': 3, 'title': 'x'}) is None
+    assert validate('notifications', {'recipientId': '../x'}) == "recipientId must be a non-negative integer"
+    assert validate('notifications', {'recipientId': 5}) is None
+
+
+def test_validate_requires_known_comment_scope():
+    assert validate('comments', {'scope': '../../x'}) is not None
+    assert validate('comments', {'scope': 'project-4'}) is None
@@ -0,0 +1,146 @@
+"""Leader/follower replication end to end: two app processes sharing REPLICATION_DIR"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def call(port, method, path, body=None):
+    """(status, decoded JSON body) of one request"""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait_for(check, timeout=20):
+    """Poll until check() returns something truthy, and return it"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            result = check()
+        except (urllib.error.URLError, ConnectionError):
+            result = None
+        if result:
+            return result
+        time.sleep(0.1)
+    raise AssertionError(f"timed out waiting for {check.__name__}")
+
+
+class Server:
+    """app.py run in its own working directory (so its own data/) with the given environment"""
+
+    def __init__(self, workdir, env):
+        self.workdir = workdir
+        self.env = env
+        self.port = free_port()
+        self.process = None
+        self.log_path = os.path.join(workdir, 'server.log')
+
+    def start(self):
+        env = dict(os.environ, PORT=str(self.port), FLASK_DEBUG='false', PYTHONUNBUFFERED='1', **self.env)
+        with open(self.log_path, 'a') as log:
+            self.process = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, 'app.py')],
+                                            cwd=self.workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        wait_for(lambda: call(self.port, 'GET', '/')[0] == 200)
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+            self.process = None
+
+    def output(self):
+        with open(self.log_path) as f:
+            return f.read()
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    replication_dir = str(tmp_path / 'replication')
+    servers = {}
+    for role in ('leader', 'follower'):
+        workdir = tmp_path / role
+        shutil.copytree(os.path.join(BACKEND_DIR, 'data'), workdir / 'data',
+                        ignore=lambda directory, names: [n for n in names if not n.endswith('.json')])
+        env = {'REPLICATION_ROLE': role, 'REPLICATION_POLL_INTERVAL': '0.1', 'CHANGELOG_MAX_BYTES': '65536'}
+        if role == 'leader':
+            env['REPLICATION_DIR'] = replication_dir
+        else:
+            env['REPLICATION_SOURCE'] = replication_dir
+        servers[role] = Server(str(workdir), env)
+    servers['leader'].start()
+    # The leader writes its first snapshot on its first request
+    assert call(servers['leader'].port, 'GET', '/api/replication/status')[0] == 200
+    servers['follower'].start()
+    yield servers['leader'], servers['follower']
+    for server in servers.values():
+        server.stop()
+
+
+def new_project(title, description='A project'):
+    return {'hackathonId': 1, 'title': title, 'description': description, 'teamMembers': [], 'selectedTracks': []}
+
+
+def test_follower_catches_up_and_refuses_writes(cluster):
+    leader, follower = cluster
+
+    status, project = call(leader.port, 'POST', '/api/projects', new_project('Replicated'))
+    assert status == 201
+    assert call(leader.port, 'POST', '/api/comments/1/like')[0] == 200
+    assert call(leader.port, 'POST', '/api/notifications',
+                {'title': 'Hi', 'message': 'Welcome', 'recipientIds': [41]})[0] == 201
+
+    def project_replicated():
+        status, body = call(follower.port, 'GET', f"/api/projects/{project['id']}")
+        return status == 200 and body['title'] == 'Replicated'
+    wait_for(project_replicated)
+
+    likes = {c['id']: c['likes'] for c in call(leader.port, 'GET', '/api/comments')[1]}
+    wait_for(lambda: {c['id']: c['likes'] for c in call(follower.port, 'GET', '/api/comments')[1]} == likes)
+    wait_for(lambda: call(follower.port, 'GET', '/api/users/41/inbox')[1].get('notifications')
+             == {'total': 1, 'unread': 1})
+
+    # A follower reading from a directory has no leader URL to forward writes to
+    status, body = call(follower.port, 'POST', '/api/projects', new_project('Rejected'))
+    assert status == 503
+    assert call(follower.port, 'GET', '/api/projects')[1] == call(leader.port, 'GET', '/api/projects')[1]
+
+
+def test_follower_rebootstraps_after_log_rotation(cluster):
+    leader, follower = cluster
+    status, first = call(leader.port, 'POST', '/api/projects', new_project('Before'))
+    wait_for(lambda: call(follower.port, 'GET', f"/api/projects/{first['id']}")[0] == 200)
+    follower.stop()
+
+    # Rotate the mutation log twice so the follower's position is no longer retained
+    start_generation = int(call(leader.port, 'GET', '/api/replication/status')[1]['head'].split(':')[0])
+    last = None
+    while int(call(leader.port, 'GET', '/api/replication/status')[1]['head'].split(':')[0]) < start_generation + 2:
+        status, last = call(leader.port, 'POST', '/api/projects', new_project('Filler', 'x' * 4096))
+        assert status == 201
+
+    follower.start()
+    wait_for(lambda: call(follower.port, 'GET', f"/api/projects/{last['id']}")[0] == 200)
+    assert follower.output().count('Replica bootstrapped from snapshot') == 2
@@ -0,0 +1,97 @@
+"""Binary snapshot store (snapshot.SnapshotStore): batched upserts and compaction"""
+
+import os
+import threading
+
+from snapshot import SnapshotStore
+
+
+def records(*ids, size=10):
+    return [{"id": record_id, "title": f"record {record_id}", "body": "x" * size} for record_id in ids]
+
+
+def test_put_many_inserts_and_replaces_in_one_write(tmp_path):
+    path = str(tmp_path / 'projects.snap')
+    store = SnapshotStore(path)
+    store.write_all(records(1, 2, 3))
+    reader = SnapshotStore(path)
+    assert reader.get(2)['title'] == 'record 2'
+
+    store.put_many([dict(records(2)[0], title='changed'), *records(10)])
+
+    # Another open store (another worker) picks up the new header on its next read
+    assert reader.ids() == [1, 2, 3, 10]
+    assert reader.get(2)['title'] == 'changed'
+    assert reader.get(10)['title'] == 'record 10'
+    assert reader.next_id() == 11
+    assert [r['id'] for r in SnapshotStore(path).all()] == [1, 2, 3, 10]
+
+
+def test_put_many_on_missing_file_creates_it(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'new.snap'))
+    store.put_many(records(5, 6))
+    assert store.exists()
+    assert store.ids() == [5, 6]
+    assert store.next_id() == 7
+
+
+def test_compact_drops_superseded_blobs(tmp_path):
+    path = str(tmp_path / 'projects.snap')
+    store = SnapshotStore(path)
+    store.write_all(records(1, 2, 3, size=200))
+    fresh_size = os.path.getsize(path)
+
+    store.put_many([dict(records(1, size=200)[0], title='v2')])
+    assert os.path.getsize(path) > fresh_size
+
+    store.compact()
+    expected = SnapshotStore(str(tmp_path / 'expected.snap'))
+    expected.write_all(store.all())
+    assert os.path.getsize(path) == os.path.getsize(expected.path)
+    assert store.get(1)['title'] == 'v2'
+    assert store.ids() == [1, 2, 3]
+
+
+def test_repeated_updates_compact_automatically(tmp_path):
+    path = str(tmp_path / 'projects.snap')
+    store = SnapshotStore(path)
+    store.write_all(records(*range(1, 11), size=500))
+    fresh_size = os.path.getsize(path)
+
+    for version in range(50):
+        store.put_many([dict(r, title=f"v{version}") for r in records(1, 2, size=500)])
+        # Dead bytes never grow past the live ones
+        assert os.path.getsize(path) <= 2 * fresh_size + 2000
+
+    assert store.get(1)['title'] == 'v49'
+    assert store.get(3)['title'] == 'record 3'
+    assert len(store) == 10
+
+
+def test_concurrent_readers_see_consistent_versions(tmp_path):
+    path = str(tmp_path / 'projects.snap')
+    writer = SnapshotStore(path)
+    writer.write_all(records(*range(1, 51)))
+    shared = SnapshotStore(path)  # one store per process, shared by its request threads
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                for record_id in (1, 25, 50):
+                    assert shared.get(record_id)['id'] == record_id
+                assert len(shared.all()) == 50
+            except Exception as e:  # noqa: BLE001 - reported by the main thread
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(8)]
+    for thread in readers:
+        thread.start()
+    for round_number in range(50):
+        # Growing bodies keep moving records, and compaction swaps the file
+        writer.put_many(records(1, 25, 50, size=round_number))
+    done.set()
+    for thread in readers:
+        thread.join()
+    assert errors == []
@@ -0,0 +1,73 @@
+"""Streaming JSON upload parsing (uploads.receive_json)"""
+
+import base64
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+from uploads import UploadError, receive_json
+
+# A PNG signature followed by bytes whose base64 is mostly '/' characters
+PNG = b'\x89PNG\r\n\x1a\n' + b'\xff' * 300 + bytes(range(256))
+
+
+class ChunkedStream:
+    """A request stream that hands out at most `size` bytes per read"""
+
+    def __init__(self, data, size):
+        self.data = io.BytesIO(data)
+        self.size = size
+
+    def read(self, n=-1):
+        return self.data.read(self.size)
+
+
+def leftovers(upload_dir):
+    return [name for name in os.listdir(upload_dir) if name.startswith('.upload-')]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64 * 1024])
+def test_base64_split_across_chunks(tmp_path, chunk_size):
+    body = json.dumps({"title": "Demo", "imageBase64": base64.b64encode(PNG).decode(), "tags": ["a"]})
+    payload, image = receive_json(ChunkedStream(body.encode(), chunk_size), upload_dir=str(tmp_path))
+
+    assert payload == {"title": "Demo", "tags": ["a"]}
+    assert image.ext == 'png'
+    assert image.sha256 == hashlib.sha256(PNG).hexdigest()
+    image.save('demo.png')
+    assert (tmp_path / 'demo.png').read_bytes() == PNG
+    assert leftovers(tmp_path) == []
+
+
+def test_escaped_slashes_in_base64(tmp_path):
+    encoded = base64.b64encode(PNG).decode()
+    assert '/' in encoded
+    body = '{"imageBase64": "data:image/png;base64,%s", "title": "a\\/b"}' % encoded.replace('/', '\\/')
+    payload, image = receive_json(ChunkedStream(body.encode(), 5), upload_dir=str(tmp_path))
+
+    assert payload == {"title": "a/b"}
+    assert image.size == len(PNG)
+    assert image.sha256 == hashlib.sha256(PNG).hexdigest()
+    image.discard()
+
+
+def test_nested_image_key_is_left_in_payload(tmp_path):
+    body = json.dumps({"meta": {"imageBase64": "not-an-image"}, "title": "x"})
+    payload, image = receive_json(ChunkedStream(body.encode(), 4), upload_dir=str(tmp_path))
+
+    assert image is None
+    assert payload == {"meta": {"imageBase64": "not-an-image"}, "title": "x"}
+    assert leftovers(tmp_path) == []
+
+
+@pytest.mark.parametrize('cut', [20, 200])
+def test_truncated_body_is_rejected_and_cleaned_up(tmp_path, cut):
+    body = json.dumps({"title": "x", "imageBase64": base64.b64encode(PNG).decode()}).encode()
+    with pytest.raises(UploadError) as error:
+        receive_json(ChunkedStream(body[:cut], 16), upload_dir=str(tmp_path))
+
+    assert error.value.status == 400
+    assert leftovers(tmp_path) == []
@@ -0,0 +1,306 @@
+"""
+DeHack Platform - Upload pipeline
+Receives images from multipart forms and from JSON bodies carrying a base64
+field, writing them to disk as they arrive instead of holding the body, the
+base64 text and the decoded bytes in memory at once.
+
+JSON bodies are scanned as a stream: the base64 field is decoded a chunk at
+a time straight into a temp file next to its final location, and only the
+remaining (small) fields are kept and parsed. For every upload the image
+type is checked against the magic bytes of the first chunk, the decoded
+size against UPLOAD_MAX_BYTES and a SHA-256 is computed while writing, so
+a bad or oversized upload is rejected as soon as it shows. Peak memory per
+upload stays at one read chunk.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+
+import codec
+
+# Uploads directory
+UPLOAD_DIR = "uploads"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Largest accepted image, after decoding
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+
+# Largest request body on upload routes: the base64 image (4/3 of its size) plus the other fields
+UPLOAD_BODY_MAX_BYTES = UPLOAD_MAX_BYTES * 4 // 3 + 256 * 1024
+
+# Bytes read from the request per step
+READ_CHUNK = 64 * 1024
+
+# JSON fields that may carry a base64 image
+IMAGE_FIELDS = ('imageBase64', 'image_base64')
+
+_SPECIAL = re.compile(rb'["\\]')
+_WHITESPACE = b' \t\r\n'
+
+
+class UploadError(Exception):
+    """An upload was rejected; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def sniff_image(head):
+    """Image extension from the first bytes of a file, or None if it is not a supported image"""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class PendingImage:
+    """An upload being written to a temp file; checked, sized and hashed as it is written"""
+
+    def __init__(self, upload_dir=UPLOAD_DIR, max_bytes=UPLOAD_MAX_BYTES):
+        self.upload_dir = upload_dir
+        self.max_bytes = max_bytes
+        self.file = tempfile.NamedTemporaryFile(dir=upload_dir, prefix='.upload-', suffix='.tmp', delete=False)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.ext = None
+
+    def write(self, data):
+        if not data:
+            return
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadError(f"Image exceeds the {self.max_bytes} byte limit", 413)
+        if self.ext is None:
+            self.head += data[:12 - len(self.head)]
+            if len(self.head) >= 12:
+                self._check_type()
+        self.digest.update(data)
+        self.file.write(data)
+
+    def _check_type(self):
+        self.ext = sniff_image(self.head)
+        if self.ext is None:
+            raise UploadError("Unsupported image type")
+
+    @property
+    def sha256(self):
+        return self.digest.hexdigest()
+
+    def save(self, filename):
+        """Move the finished upload to its final name in the upload directory"""
+        if self.ext is None:
+            self._check_type()
+        if self.size == 0:
+            raise UploadError("Empty image")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.file.name, os.path.join(self.upload_dir, filename))
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.file.name)
+        except FileNotFoundError:
+            pass
+
+
+class Base64Decoder:
+    """Incremental base64 decoder; accepts raw base64 or a data:image/...;base64, URL"""
+
+    def __init__(self, image):
+        self.image = image
+        self.prefix = b''
+        self.started = False
+        self.pending = b''
+
+    def feed(self, text):
+        if not self.started:
+            self.prefix += text
+            if not self.prefix.startswith(b'data:'[:len(self.prefix)]):
+                text, self.started = self.prefix, True
+            elif b',' in self.prefix:
+                header, text = self.prefix.split(b',', 1)
+                if not re.match(rb'^data:image/[a-z+.-]+;base64$', header, re.IGNORECASE):
+                    raise UploadError("Invalid base64 image")
+                self.started = True
+            elif len(self.prefix) > 256:
+                raise UploadError("Invalid base64 image")
+            else:
+                return
+
+        data = self.pending + text.translate(None, _WHITESPACE)
+        cut = len(data) - len(data) % 4
+        self.pending = data[cut:]
+        if cut:
+            self._decode(data[:cut])
+
+    def _decode(self, data):
+        try:
+            self.image.write(base64.b64decode(data, validate=True))
+        except binascii.Error:
+            raise UploadError("Invalid base64 image")
+
+    def close(self):
+        if not self.started:
+            if not self.prefix:
+                return  # empty string: no image
+            self.feed(b'')
+            if not self.started:
+                raise UploadError("Invalid base64 image")
+        if self.pending:
+            self._decode(self.pending + b'=' * (-len(self.pending) % 4))
+            self.pending = b''
+
+
+def receive_file(file_storage, upload_dir=UPLOAD_DIR, max_bytes=UPLOAD_MAX_BYTES):
+    """Copy a multipart file part into a PendingImage chunk by chunk
+
+    The content must match the image type named by the file's extension.
+    """
+    image = PendingImage(upload_dir, max_bytes)
+    try:
+        while True:
+            chunk = file_storage.stream.read(READ_CHUNK)
+            if not chunk:
+                break
+            image.write(chunk)
+        if image.ext is None:
+            image._check_type()
+        named = file_storage.filename.rsplit('.', 1)[-1].lower().replace('jpeg', 'jpg')
+        if named != image.ext:
+            raise UploadError("File content does not match its extension")
+    except BaseException:
+        image.discard()
+        raise
+    return image
+
+
+def receive_json(stream, upload_dir=UPLOAD_DIR, max_bytes=UPLOAD_MAX_BYTES, max_body=UPLOAD_BODY_MAX_BYTES):
+    """Parse a JSON object body, streaming its base64 image field into a PendingImage
+
+    Returns (payload, image). The image field is removed from payload; image is
+    None when the body has none. The caller must save() or discard() the image.
+    """
+    rest = bytearray()
+    image = None
+    decoder = None
+    streaming = False
+    stream_escape = False
+    in_string = escape = False
+    depth = 0
+    key_buf = None
+    last_string = None
+    value_key = None
+    field_names = {name.encode() for name in IMAGE_FIELDS}
+    received = 0
+
+    try:
+        while True:
+            chunk = stream.read(READ_CHUNK)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > max_body:
+                raise UploadError(f"Request body exceeds the {max_body} byte limit", 413)
+
+            i, n = 0, len(chunk)
+            while i < n:
+                if streaming:
+                    if stream_escape:
+                        # JSON encoders may escape '/' and wrap long strings with \n
+                        escaped = chunk[i:i + 1]
+                        if escaped == b'/':
+                            decoder.feed(b'/')
+                        elif escaped not in (b'n', b'r', b't'):
+                            raise UploadError("Invalid base64 image")
+                        stream_escape = False
+                        i += 1
+                        continue
+                    match = _SPECIAL.search(chunk, i)
+                    if match is None:
+                        decoder.feed(chunk[i:])
+                        break
+                    decoder.feed(chunk[i:match.start()])
+                    i = match.end()
+                    if match.group() == b'\\':
+                        stream_escape = True
+                    else:
+                        decoder.close()
+                        streaming = False
+                    continue
+
+                c = chunk[i]
+                i += 1
+                if in_string:
+                    rest.append(c)
+                    if escape:
+                        escape = False
+                    elif c == 0x5c:  # backslash
+                        escape = True
+                    elif c == 0x22:  # closing quote
+                        in_string = False
+                        if depth == 1 and key_buf is not None:
+                            last_string = bytes(key_buf)
+                        continue
+                    if key_buf is not None:
+                        key_buf.append(c)
+                        if len(key_buf) > 64:
+                            key_buf = None
+                    continue
+
+                if c == 0x22:  # opening quote
+                    if depth == 1 and value_key in field_names and image is None:
+                        image = PendingImage(upload_dir, max_bytes)
+                        decoder = Base64Decoder(image)
+                        streaming = True
+                        value_key = None
+                        rest += b'true'
+                        continue
+                    in_string = True
+                    key_buf = bytearray()
+                    value_key = None
+                elif c == 0x3a and depth == 1:  # ':'
+                    value_key, last_string = last_string, None
+                elif c in b'{[':
+                    depth += 1
+                    value_key = None
+                elif c in b'}]':
+                    depth -= 1
+                elif c not in _WHITESPACE:
+                    value_key = None
+                rest.append(c)
+                if len(rest) > max_body:
+                    raise UploadError(f"Request body exceeds the {max_body} byte limit", 413)
+
+        if streaming or in_string:
+            raise UploadError("Invalid JSON body")
+        try:
+            payload = codec.loads(bytes(rest)) if rest.strip() else {}
+        except ValueError:
+            raise UploadError("Invalid JSON body")
+        if not isinstance(payload, dict):
+            raise UploadError("JSON body must be an object")
+    except BaseException:
+        if image is not None:
+            image.discard()
+        raise
+
+    if image is not None and image.size == 0:
+        image.discard()
+        image = None
+    for name in IMAGE_FIELDS:
+        payload.pop(name, None)
+    return payload, image